@@ -0,0 +1,34 @@
+# Times repeated .call() on the README gm example, which builds a wrapper for the method passed as an argument.
+import timeit
+from pyfop import lazy, autoaspects
+import pyfop.utils as utils
+
+
+@lazy
+@autoaspects
+def affine(x, scale=1, offset=0):
+    return x*scale + offset
+
+
+@lazy
+@autoaspects
+def gm(x, y, affine=affine):
+    return (affine(x)*affine(y))**0.5
+
+
+def measure(run, number=500):
+    return min(timeit.repeat(run, number=number, repeat=5)) / number
+
+
+if __name__ == "__main__":
+    graph = gm(2, 8)
+    assert graph.call(scale=3) == 12
+
+    def rebuild():
+        utils._built.clear()  # generate wrappers on every evaluation, as before memoization
+        return graph.call(scale=3)
+
+    rebuilt = measure(rebuild)
+    memoized = measure(lambda: graph.call(scale=3))
+    print(f"rebuilt wrappers:  {rebuilt*1.E6:.1f} us/call")
+    print(f"memoized builders: {memoized*1.E6:.1f} us/call ({rebuilt/memoized:.1f}x)")
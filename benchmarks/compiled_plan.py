@@ -0,0 +1,30 @@
+# Compares per-call overhead of .call() and of a compiled plan on the README examples.
+import timeit
+from pyfop import lazy, autoaspects
+
+
+@lazy
+@autoaspects
+def affine(x, scale=1, offset=0):
+    return x*scale + offset
+
+
+@lazy
+@autoaspects
+def gm(x, y, affine=affine):
+    return (affine(x)*affine(y))**0.5
+
+
+def measure(run, number=2000):
+    return min(timeit.repeat(run, number=number, repeat=5)) / number
+
+
+if __name__ == "__main__":
+    for title, graph in [("(affine(2)*affine(8))**0.5", (affine(2)*affine(8))**0.5), ("gm(2, 8)", gm(2, 8))]:
+        plan = graph.compile()
+        assert plan(scale=3) == graph.call(scale=3)
+        called = measure(lambda: graph.call(scale=3))
+        planned = measure(lambda: plan(scale=3))
+        print(f"{title}")
+        print(f"\t.call(): {called*1.E6:.1f} us/call")
+        print(f"\tplan():  {planned*1.E6:.1f} us/call ({called/planned:.1f}x)")
@@ -0,0 +1,32 @@
+# Evaluates running sums 100k levels deep, which exceeded the recursion limit when graphs were walked recursively.
+import sys
+import time
+import pyfop as pfp
+
+
+@pfp.lazy_no_cache
+def step(i, scale=pfp.Aspect(1)):
+    return i * scale
+
+
+def running_sum(depth):
+    total = step(0)
+    for i in range(1, depth):
+        total = total + step(i)
+    return total
+
+
+if __name__ == "__main__":
+    depths = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    for depth in depths:
+        graph = running_sum(depth)
+        tic = time.perf_counter()
+        assert graph.call(scale=2) == depth * (depth - 1)
+        called = time.perf_counter() - tic
+        tic = time.perf_counter()
+        plan = graph.compile()
+        compiled = time.perf_counter() - tic
+        tic = time.perf_counter()
+        assert plan(scale=2) == depth * (depth - 1)
+        planned = time.perf_counter() - tic
+        print(f"depth {depth}: .call() {called:.2f} s, compile {compiled:.2f} s, plan() {planned:.2f} s")
@@ -0,0 +1,28 @@
+# Evaluates a depth-30 chain of diamonds, which would take exponential time if shared calls were walked as a tree.
+import timeit
+import pyfop as pfp
+
+
+@pfp.lazy_no_cache
+@pfp.autoaspects
+def step(x, inc=1):
+    return x + inc
+
+
+def diamonds(depth=30):
+    x = step(0)
+    for _ in range(depth-1):
+        y = step(x)
+        x = y*y - y*y + y  # each level reconverges on y three times
+    return x
+
+
+if __name__ == "__main__":
+    graph = diamonds()
+    assert graph.call(inc=2) == 60
+    number = 20
+    called = min(timeit.repeat(lambda: graph.call(inc=2), number=number, repeat=3)) / number
+    plan = graph.compile()
+    planned = min(timeit.repeat(lambda: plan(inc=2), number=number, repeat=3)) / number
+    print(f".call(): {called*1000:.2f} ms/call")
+    print(f"plan():  {planned*1000:.2f} ms/call")
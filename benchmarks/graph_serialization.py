@@ -0,0 +1,61 @@
+# Serializes lazy graphs and ships them to worker processes.
+#   round trip: dumps and loads of running sums with many calls
+#   throughput: graphs holding large arrays, with buffers copied into the pickle or passed out-of-band
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import pyfop as pfp
+from deep_chains import running_sum
+
+
+@pfp.lazy
+@pfp.autoaspects
+def weighted(x, weight=1.):
+    return x * weight
+
+
+def evaluate(graph, weight):
+    return graph.call(weight=weight)
+
+
+def round_trip(depth):
+    graph = running_sum(depth)
+    tic = time.perf_counter()
+    data = pfp.dumps(graph)
+    dumped = time.perf_counter() - tic
+    tic = time.perf_counter()
+    loaded = pfp.loads(data)
+    restored = time.perf_counter() - tic
+    assert loaded.call(scale=2) == depth * (depth - 1)
+    print(f"chain of {depth}: dumps {dumped*1000:.1f} ms, loads {restored*1000:.1f} ms, "
+          f"{len(data)/(2*depth-1):.1f} bytes per call")
+
+
+def throughput(nbytes):
+    x = np.random.default_rng(0).random(nbytes // 8)
+    graph = weighted(x).sum()
+    tic = time.perf_counter()
+    loaded = pfp.loads(pfp.dumps(graph))
+    inband = time.perf_counter() - tic
+    assert loaded.call(weight=2.) == graph.call(weight=2.)
+    tic = time.perf_counter()
+    buffers = list()
+    data = pfp.dumps(graph, buffers)
+    loaded = pfp.loads(data, buffers)
+    outband = time.perf_counter() - tic
+    assert loaded.call(weight=2.) == graph.call(weight=2.)
+    print(f"{nbytes/2**20:.0f} MB constant: in-band {nbytes/inband/2**30:.2f} GB/s, "
+          f"out-of-band {nbytes/outband/2**30:.2f} GB/s with {len(data)} bytes pickled")
+
+
+if __name__ == "__main__":
+    for depth in [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]:
+        round_trip(depth)
+    for nbytes in [2**20, 2**26, 2**28]:
+        throughput(nbytes)
+    graph = weighted(np.arange(10.)).sum()
+    with ProcessPoolExecutor(2) as executor:  # graphs are pickled by module and qualified names of their methods
+        results = list(executor.map(evaluate, [graph]*4, [1.]*4))
+    assert results == [45.]*4
+    print("shipped graphs to worker processes:", results)
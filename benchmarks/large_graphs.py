@@ -0,0 +1,36 @@
+# Builds and traverses a balanced sum of 2**20 lazy calls (about 1M nodes) and reports time and memory.
+import time
+import tracemalloc
+import pyfop as pfp
+
+
+@pfp.lazy_no_cache
+def leaf(x):
+    return x
+
+
+def build(depth=20):
+    level = [leaf(i) for i in range(2**depth)]
+    while len(level) > 1:
+        level = [level[i] + level[i+1] for i in range(0, len(level), 2)]
+    return level[0]
+
+
+if __name__ == "__main__":
+    tracemalloc.start()
+    graph = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del graph
+    tic = time.perf_counter()
+    graph = build()
+    built = time.perf_counter() - tic
+    tic = time.perf_counter()
+    graph.get_input_context()
+    gathered = time.perf_counter() - tic
+    tic = time.perf_counter()
+    graph.compile()
+    compiled = time.perf_counter() - tic
+    print(f"build:   {built:.2f} s, {memory/2**20:.0f} MB")
+    print(f"gather:  {gathered:.2f} s")
+    print(f"compile: {compiled:.2f} s")
@@ -0,0 +1,25 @@
+# Times gathering and calling a chain of 50 methods that each expose the same 300 aspects.
+import timeit
+import pyfop as pfp
+
+names = [f"a{i}" for i in range(300)]
+namespace = dict()
+exec(f"def layer(x, {', '.join(name + '=1' for name in names)}):\n    return x + a0", namespace)
+layer = pfp.lazy_no_cache(pfp.autoaspects(namespace["layer"]))
+
+
+def chain(length=50):
+    x = layer(0)
+    for _ in range(length-1):
+        x = layer(x)
+    return x
+
+
+if __name__ == "__main__":
+    graph = chain()
+    assert graph.call(a0=2) == 100
+    number = 10
+    gathered = min(timeit.repeat(lambda: graph.get_input_context(a0=2), number=number, repeat=5)) / number
+    called = min(timeit.repeat(lambda: graph.call(a0=2), number=number, repeat=5)) / number
+    print(f"get_input_context: {gathered*1000:.2f} ms")
+    print(f".call():           {called*1000:.2f} ms")
@@ -0,0 +1,35 @@
+# Evaluates an arithmetic expression over a large array with and without fusing its operators into one kernel.
+import timeit
+import tracemalloc
+import numpy as np
+import pyfop as pfp
+
+
+@pfp.lazy_no_cache
+@pfp.autoaspects
+def signal(n, scale=1.):
+    return np.linspace(0, scale, n)
+
+
+def expression(n=10**6):
+    x = signal(n)
+    return -abs((x*2 + 1)/3 - 6)**2
+
+
+def peak(plan, **kwargs):
+    tracemalloc.start()
+    plan(**kwargs)
+    ret = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ret
+
+
+if __name__ == "__main__":
+    graph = expression()
+    unfused = graph.compile()
+    fused = graph.compile(fuse=True)
+    assert np.allclose(unfused(scale=2.), fused(scale=2.))
+    number = 20
+    for name, plan in [("unfused", unfused), ("fused", fused)]:
+        elapsed = min(timeit.repeat(lambda: plan(scale=2.), number=number, repeat=3)) / number
+        print(f"{name}: {len(plan.nodes)} nodes, {elapsed*1000:.2f} ms/call, peak {peak(plan, scale=2.)/2**20:.1f} MB")
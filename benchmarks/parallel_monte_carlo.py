@@ -0,0 +1,56 @@
+# Runs the independent integrations of a Monte Carlo estimate of pi with increasingly many workers,
+# and the split integration of examples/monte_carlo.py, whose samples are divided among the workers.
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
+from pyfop import lazy_no_cache, autoaspects
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples"))
+import monte_carlo
+
+
+@lazy_no_cache
+@autoaspects
+def integrate(seed, samples=4000000):
+    x = np.random.default_rng(seed).random(samples)
+    return np.mean(np.sqrt(1-x**2))
+
+
+def estimate(branches=8):
+    total = integrate(0)
+    for seed in range(1, branches):
+        total = total + integrate(seed)
+    return 4*total/branches
+
+
+def measure(graph, executor=None, samples=4000000):
+    tic = time.perf_counter()
+    graph.call(executor, samples=samples)
+    return time.perf_counter() - tic
+
+
+if __name__ == "__main__":
+    graph = estimate()
+    serial = measure(graph)
+    print(f"sequential: {serial:.2f} s")
+    workers = 1
+    while workers <= os.cpu_count():
+        for name, pool in [("threads", ThreadPoolExecutor), ("processes", ProcessPoolExecutor)]:
+            with pool(workers) as executor:
+                measure(graph, executor)  # warm up workers
+                elapsed = measure(graph, executor)
+            print(f"{workers} {name}: {elapsed:.2f} s ({serial/elapsed:.1f}x)")
+        workers *= 2
+    # the example integrates in pure Python, so threads only scale where the interpreter runs them in parallel,
+    # and its Uniform instances cannot be sent to worker processes, which would run everything in this process
+    split = monte_carlo.pi
+    serial = measure(split, samples=2000000)
+    print(f"split example, sequential: {serial:.2f} s")
+    workers = 1
+    while workers <= os.cpu_count():
+        with ThreadPoolExecutor(workers) as executor:
+            elapsed = measure(split, executor, samples=2000000)
+            assert split.call(executor, samples=1000, seed=1) == split.call(executor, samples=1000, seed=1)
+        print(f"split example, {workers} threads: {elapsed:.2f} s ({serial/elapsed:.1f}x)")
+        workers *= 2
@@ -0,0 +1,58 @@
+# Measures the peak memory of an array pipeline whose intermediates are kept until the end versus released early.
+import tracemalloc
+import numpy as np
+import pyfop as pfp
+
+
+@pfp.lazy
+@pfp.autoaspects
+def load(n, seed=0):
+    return np.random.default_rng(seed).random(n)
+
+
+@pfp.lazy
+@pfp.autoaspects
+def smooth(x, width=5):
+    return np.convolve(x, np.ones(width) / width, mode="same")
+
+
+@pfp.lazy
+def center(x):
+    return x - x.mean()
+
+
+@pfp.lazy
+def normalize(x):
+    return x / np.abs(x).max()
+
+
+@pfp.lazy
+def energy(x):
+    return float((x * x).sum())
+
+
+def pipeline(n=2**22, stages=6):
+    x = load(n)
+    for _ in range(stages):
+        x = normalize(center(smooth(x)))
+    return energy(x)
+
+
+def peak(run):
+    pfp.cache.cleanup()
+    tracemalloc.start()
+    result = run()
+    ret = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    pfp.cache.cleanup()
+    return result, ret
+
+
+if __name__ == "__main__":
+    graph = pipeline()
+    called, called_peak = peak(lambda: graph.call(seed=1))
+    plan = graph.compile(release=True)
+    released, released_peak = peak(lambda: plan(seed=1))
+    assert abs(called - released) < 1.E-6 * abs(called)
+    print(f".call():              peak {called_peak/2**20:.0f} MB")
+    print(f"compile(release=True): peak {released_peak/2**20:.0f} MB")
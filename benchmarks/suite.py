@@ -0,0 +1,218 @@
+# Runs all benchmark cases offline and saves or compares a JSON baseline of seconds per run.
+#   python benchmarks/suite.py --save baseline.json
+#   python benchmarks/suite.py --compare baseline.json --tolerance 0.25
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import runpy
+import sys
+import timeit
+import numpy as np
+import pyfop as pfp
+import pyfop.utils as utils
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # reuse the graphs of the standalone benchmarks
+from deep_chains import running_sum
+from diamond_chain import diamonds
+from operator_fusion import expression
+
+_cases = dict()
+
+
+def case(method):
+    _cases[method.__name__] = method
+    return method
+
+
+@pfp.lazy_no_cache
+@pfp.autoaspects
+def step(x, inc=1):
+    return x + inc
+
+
+def plain(x, inc=1):
+    return x + inc
+
+
+@case
+def construction_operators():
+    def run():
+        x = step(0)
+        for _ in range(1000):
+            x = x*2 + 1
+        return x
+    return run
+
+
+@case
+def gather_wide():
+    level = [step(i) for i in range(1024)]
+    while len(level) > 1:  # balanced sum of all leaves
+        level = [left + right for left, right in zip(level[::2], level[1::2])]
+    return level[0].get_input_context
+
+
+@case
+def gather_deep():
+    graph = running_sum(1000)
+    return graph.get_input_context
+
+
+@case
+def call_overhead():
+    graph = step(1)
+    return lambda: graph.call(inc=2)
+
+
+@case
+def call_plain():
+    return lambda: plain(1, inc=2)
+
+
+@case
+def eager_plain():
+    method = pfp.eager(plain)
+    return lambda: method(1, inc=2)
+
+
+@case
+def eager_no_cache_plain():
+    method = pfp.eager_no_cache(plain)
+    return lambda: method(1, inc=2)
+
+
+@case
+def call_deep():
+    graph = running_sum(1000)
+    return lambda: graph.call(scale=2)
+
+
+@case
+def plan_diamonds():
+    plan = diamonds().compile()
+    return lambda: plan(inc=2)
+
+
+@case
+def plan_fused():
+    plan = expression(10**5).compile(fuse=True)
+    return lambda: plan(scale=2.)
+
+
+@case
+def cache_hit():
+    hasher = pfp.cache.MethodHasher(plain)
+    hasher(1, inc=2)
+    return lambda: hasher(1, inc=2)
+
+
+@case
+def cache_miss():
+    hasher = pfp.cache.MethodHasher(plain, maxsize=1)
+    args = [float(i) for i in range(2)]
+    return lambda: (hasher(args[0], inc=1.), hasher(args[1], inc=1.))
+
+
+@case
+def builder_wrapping():
+    method = utils.autoaspects(lambda x, scale=1, offset=0: x*scale + offset)
+    return lambda: utils._builder(method)
+
+
+@case
+def autoaspects_wrapping():
+    return lambda: utils.autoaspects(lambda x, scale=1, offset=0: x*scale + offset)
+
+
+@case
+def lazifier_numpy():
+    x = np.ones((100, 100))
+    with pfp.Lazifier() as lazify:
+        lazify(np.sum)
+        graph = np.sum(x)
+    return lambda: graph.call(axis=0)
+
+
+@case
+def numpy_plain():
+    x = np.ones((100, 100))
+    return lambda: np.sum(x, axis=0)
+
+
+def _paradigm(filename, *measure):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples", "paradigm_comparison", filename)
+    with contextlib.redirect_stdout(io.StringIO()):  # the examples print their result when run
+        example = runpy.run_path(path)
+    similarity = example["Similarity"](example[measure[0]], example[measure[1]], **measure[2])
+    return lambda: similarity(example["x"], example["y"])
+
+
+@case
+def paradigm_fop():
+    return _paradigm("method_components.py", "normalize", "KLdivergence", {"norm": 1, "epsilon": pfp.Aspect()})
+
+
+@case
+def paradigm_functional():
+    return _paradigm("method_components_nofop.py", "normalize", "KLdivergence", {"norm": 1})
+
+
+@case
+def paradigm_oop():
+    return _paradigm("method_components_oop.py", "Normalize", "KLdivergence", {"norm": 1})
+
+
+def measure(run, repeat=5):
+    number, _ = timeit.Timer(run).autorange()  # enough runs to take at least 0.2 seconds
+    return min(timeit.repeat(run, number=number, repeat=repeat)) / number
+
+
+def compare(results, baseline, tolerance):
+    regressions = list()
+    for name, elapsed in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            print(f"{name:<24} {elapsed*1.E6:>12.2f} us   (new)")
+            continue
+        ratio = elapsed / previous
+        flag = "REGRESSION" if ratio > 1+tolerance else "faster" if ratio < 1/(1+tolerance) else ""
+        print(f"{name:<24} {elapsed*1.E6:>12.2f} us   {ratio:>6.2f}x baseline   {flag}")
+        if flag == "REGRESSION":
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pyfop benchmark suite")
+    parser.add_argument("cases", nargs="*", help="names of cases to run (default: all)")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="compare results against this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown ratio above 1 flagged as regression")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.cases if name not in _cases]
+    if unknown:
+        parser.error("unknown cases: " + ", ".join(unknown))
+    results = dict()
+    for name in args.cases or _cases:
+        results[name] = measure(_cases[name](), args.repeat)
+        if not args.compare:
+            print(f"{name:<24} {results[name]*1.E6:>12.2f} us")
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                       "results": results}, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
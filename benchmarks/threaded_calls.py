@@ -0,0 +1,33 @@
+# Evaluates one shared graph with different aspects from several threads, as web workers would.
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pyfop as pfp
+
+
+@pfp.lazy_no_cache
+@pfp.autoaspects
+def signal(n=2**18, seed=0):
+    return np.random.default_rng(seed).random(n)
+
+
+@pfp.lazy_no_cache
+@pfp.autoaspects
+def spectrum(x, window=64):
+    return np.abs(np.fft.rfft(np.convolve(x, np.ones(window) / window, mode="same")))
+
+
+def throughput(graph, threads, calls=64):
+    tic = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        for result in executor.map(lambda seed: graph(seed=seed), range(calls)):
+            assert result > 0
+    return calls / (time.perf_counter() - tic)
+
+
+if __name__ == "__main__":
+    graph = spectrum(signal()).max()
+    plan = graph.compile()
+    for threads in [int(arg) for arg in sys.argv[1:]] or [1, 2, 4, 8]:
+        print(f"{threads} threads: .call() {throughput(graph, threads):.1f} calls/s, plan() {throughput(plan, threads):.1f} calls/s")
@@ -9,20 +9,22 @@ class Uniform:
         self.a = a
         self.b = b
         self.rng = np.random.default_rng(seed)
-        print(b)
 
     def random(self):
         return self.rng.random() * (self.b - self.a) + self.a
 
 
-@lazy
+@lazy(split="samples", reduce="mean")  # executors integrate chunks of the samples, each with its own Uniform(seed)
 @autoaspects
 def integrate(f, distribution=Uniform(), samples=100000):
     return sum(f(distribution.random()) for _ in range(samples))/samples
 
 
-pi = 4*integrate(lambda x: (1-x**2)**0.5)
-print(pi(samples=5000000))
+def circle(x):
+    return (1-x**2)**0.5
+
+
+pi = 4*integrate(circle)
 
 
 @lazy
@@ -32,4 +34,6 @@ def gamma(n, integrate=integrate, seed=Aspect(0, Priority.INCREASED), b=Aspect(1
     return gamman
 
 
-print(gamma(0.5)(samples=5000000, seed=1))
+if __name__ == "__main__":
+    print(pi(samples=5000000))
+    print(gamma(0.5)(samples=5000000, seed=1))
@@ -1,7 +1,9 @@
 from pyfop.aspect import Aspect, Priority
 from pyfop.execution import lazy, eager, lazy_no_cache, eager_no_cache, meta
-from pyfop.utils import autoaspects, builder
+from pyfop.utils import autoaspects, builder, vectorized
 from pyfop.cache import CacheScope
+from pyfop.profiling import profile
+from pyfop.serialization import dumps, loads
 import sys
 
 
@@ -1,4 +1,8 @@
 import inspect
+from weakref import WeakKeyDictionary
+from pyfop.aspect import Aspect
+
+_descriptors = WeakKeyDictionary()  # compiled parameter descriptors per wrapped method
 
 
 def signature(obj):
@@ -7,24 +11,43 @@ def signature(obj):
     return inspect.signature(obj)
 
 
+class ParameterDescriptor:  # parsed once per method so that graph walks do not repeat signature introspection
+    def __init__(self, method):
+        parameters = signature(method).parameters
+        self.names = list()
+        self.varargs = None  # index of *args among the positional parameters, if any
+        for pos, (arg, v) in enumerate(parameters.items()):
+            if v.kind == inspect.Parameter.VAR_POSITIONAL and self.varargs is None:
+                self.varargs = pos
+            self.names.append(arg)
+        self.defaults = {arg: v.default for arg, v in parameters.items() if v.default is not inspect.Parameter.empty}
+        self.aspects = [arg for arg, val in self.defaults.items() if isinstance(val, Aspect)]
+        self.metamethods = [arg for arg, val in self.defaults.items() if val.__class__.__name__ == 'Metamethod']
+
+    def positional(self, args):
+        if self.varargs is None:
+            if len(args) > len(self.names):
+                raise IndexError("Too many positional arguments")
+            return dict(zip(self.names, args)), list()
+        ret = dict(zip(self.names[:self.varargs], args))
+        return ret, list(args[self.varargs:])
+
+
+def describe(method):
+    try:
+        return _descriptors[method]
+    except KeyError:
+        return _descriptors.setdefault(method, ParameterDescriptor(method))  # threads racing here share one descriptor
+    except TypeError:  # methods that cannot be weakly referenced are parsed on every call
+        return ParameterDescriptor(method)
+
+
 def parse_defaults(method):
-    return {arg: v.default for arg, v in signature(method).parameters.items()
-            if not hasattr(v.default, "__name__") or v.default.__name__ != '_empty'}
+    return describe(method).defaults
 
 
 def parse_positional(method, args):
-    ret = dict()
-    method_args = list(signature(method).parameters)
-    method_args_pos = 0
-    unnamed = list()
-    for val in args:
-        if method_args[method_args_pos] == "args":
-            unnamed.append(val)
-        else:
-            ret[method_args[method_args_pos]] = val
-            method_args_pos += 1
-    return ret, unnamed
-    #return {arg: val for arg, val in zip(list(signature(method).parameters)[:len(args)], args)}
+    return describe(method).positional(args)
 
 
 def combine(*kwarg_list):
@@ -32,4 +55,4 @@ def combine(*kwarg_list):
     for kwargs in kwarg_list:
         for arg, val in kwargs.items():
             ret[arg] = val
-    return ret
\ No newline at end of file
+    return ret
@@ -16,7 +16,7 @@ class Aspect:
             if priority is None:
                 priority = default.priority
             if role is None:
-                role = self.context_role
+                role = default.context_role
             default = default.default
         self.name = None
         self.default = default
@@ -42,6 +42,10 @@ class Aspect:
         return ret
 
 
+def _extended(arg, aspect):
+    return arg if aspect.context_role is None else arg + "@" + aspect.context_role
+
+
 def _name(arg, val):
     return val.extended_name() if isinstance(val, Aspect) else arg
 
@@ -54,67 +58,159 @@ def _priority(val, default=Priority.HIGH):
     return val.priority if isinstance(val, Aspect) else default
 
 
+_unset = object()  # value of aspect slots that have not been set
+_levels = {priority.value: priority for priority in Priority}
+
+
 class Context:
-    def __init__(self):
-        self.values = dict()
-        self.priorities = dict()
-        self.usages = dict()  # counts whether the variable has been set at the given priority (there could be more total shares afterwards)
-        self.shares = dict()
+    def __init__(self, slots=None):
+        # aspects are interned to slots of parallel arrays, and contexts of the same graph share slots until a name is added
+        self.slots = dict() if slots is None else slots  # aspect name -> position in the arrays below
+        self._owned = slots is None
+        self._values = [_unset] * len(self.slots)
+        self._levels = [Priority.LOW.value] * len(self.slots)  # priority values, or LOW for unset aspects
+        self._usages = [None] * len(self.slots)  # counts whether the variable has been set at the given priority (there could be more total shares afterwards)
+        self._shares = [0] * len(self.slots)
+        self._order = list()  # slots in the order they were first set or read
+        self.visited = set()  # ids of calls and methods already gathered in this context
+        self.results = dict()  # id -> (call, result) for calls already executed in this context
+        self.profile = None  # records the evaluation of calls, if profiling is enabled
+
+    def _slot(self, arg):
+        slot = self.slots.get(arg)
+        if slot is None:
+            if not self._owned:
+                self.slots = dict(self.slots)
+                self._owned = True
+            slot = self.slots[arg] = len(self._values)
+            self._values.append(_unset)
+            self._levels.append(Priority.LOW.value)
+            self._usages.append(None)
+            self._shares.append(0)
+        return slot
+
+    def _names(self):
+        names = [None] * len(self._values)
+        for name, slot in self.slots.items():
+            names[slot] = name
+        return names
+
+    def fork(self):
+        ret = Context(self.slots)
+        self._owned = False
+        ret._values = list(self._values)
+        ret._levels = list(self._levels)
+        ret._usages = list(self._usages)
+        ret._shares = list(self._shares)
+        ret._order = list(self._order)
+        ret.visited = set(self.visited)
+        ret.results = dict(self.results)
+        ret.profile = self.profile
+        return ret
+
+    @property
+    def values(self):
+        names = self._names()
+        return {names[slot]: self._values[slot] for slot in self._order if self._values[slot] is not _unset}
+
+    @property
+    def priorities(self):
+        names = self._names()
+        return {names[slot]: _levels[self._levels[slot]] for slot in self._order if self._values[slot] is not _unset}
+
+    @property
+    def usages(self):
+        names = self._names()
+        return {names[slot]: self._usages[slot] for slot in self._order}
+
+    @property
+    def shares(self):
+        names = self._names()
+        return {names[slot]: self._shares[slot] for slot in self._order if self._values[slot] is not _unset}
 
     def to_aspects(self):
         ret = dict()
-        for arg in self.values:
-            aspect = Aspect(self.values[arg], self.priorities[arg])
+        for arg, value, priority, _ in self:
+            aspect = Aspect(value, priority)
             aspect.name = arg
             ret[arg] = aspect
         return ret
 
     def add(self, arg, val, default_priority=Priority.HIGH, is_default=False):
-        arg = _name(arg, val)
-        #if arg is None and isinstance(val, Aspect): # TODO: enable to remove some redundant execution.py code
-        #    val.name = arg
-        priority_diff = self.priorities.get(arg, Priority.LOW).value - _priority(val, default_priority).value
+        if isinstance(val, Aspect):
+            arg = val.extended_name()
+            priority = val.priority
+            val = val.default
+        else:
+            priority = default_priority
+        slot = self._slot(arg)
+        priority_diff = self._levels[slot] - priority._value_
         if priority_diff <= 0:
-            if priority_diff == 0 and arg in self.values and id(self.values[arg]) != id(_value(arg, val)):
+            usage = self._usages[slot]
+            if priority_diff == 0 and self._values[slot] is not _unset and self._values[slot] is not val:
                 raise Exception("Conflicting values with the same priority ("
-                                +str(self.priorities.get(arg, Priority.LOW))+") for argument: "+str(arg)+" (consider assigning different roles)")
-            #print(arg, _value(arg, val), _priority(val, default_priority))
-            if arg in self.usages and self.usages[arg] == 0 and not is_default:
+                                +str(_levels[self._levels[slot]])+") for argument: "+str(arg)+" (consider assigning different roles)")
+            if usage == 0 and not is_default:
                 raise Exception("Unused argument: "+arg)
-            self.values[arg] = _value(arg, val)
-            self.priorities[arg] = _priority(val, default_priority)
-            self.shares[arg] = self.shares.get(arg, 0) + 1
-            if priority_diff == 0 and arg in self.usages:
-                self.usages[arg] += 1
+            if usage is None:
+                self._order.append(slot)
+            self._values[slot] = val
+            self._levels[slot] = priority._value_
+            self._shares[slot] += 1
+            if priority_diff == 0 and usage is not None:
+                self._usages[slot] = usage + 1
             else:
-                self.usages[arg] = 1 if is_default else 0
+                self._usages[slot] = 1 if is_default else 0
 
     def extend(self, kwargs, default_priority=Priority.HIGH, is_default=False):
         for arg, val in kwargs.items():
             self.add(arg, val, default_priority, is_default)
 
     def get(self, arg):
-        self.usages[arg] = self.usages.get(arg, 0) + 1
-        return self.values.get(arg, None)
+        slot = self._slot(arg)
+        usage = self._usages[slot]
+        if usage is None:
+            self._order.append(slot)
+            usage = 0
+        self._usages[slot] = usage + 1
+        val = self._values[slot]
+        return None if val is _unset else val
+
+    def peek(self, arg):  # like get, without counting as a usage
+        slot = self.slots.get(arg)
+        val = _unset if slot is None else self._values[slot]
+        return None if val is _unset else val
+
+    def usage(self, arg, default=None):
+        slot = self.slots.get(arg)
+        usage = None if slot is None else self._usages[slot]
+        return default if usage is None else usage
 
     def catch_unused(self):
-        for arg, usage in self.usages.items():
-            if usage == 0:
-                raise Exception("Unused argument: "+arg+" (no aspect with such name)")
+        for slot in self._order:
+            if self._usages[slot] == 0:
+                raise Exception("Unused argument: "+self._names()[slot]+" (no aspect with such name)")
         pass
 
     def __iter__(self):
-        for item in self.values:
-            yield item, self.values[item], self.priorities[item], self.shares[item]
+        names = self._names()
+        for slot in self._order:
+            if self._values[slot] is not _unset:
+                yield names[slot], self._values[slot], _levels[self._levels[slot]], self._shares[slot]
 
     def __contains__(self, item):
-        return item in self.values
+        slot = self.slots.get(item)
+        return slot is not None and self._values[slot] is not _unset
 
     def __getitem__(self, item):
-        return self.values[item]
+        slot = self.slots.get(item)
+        if slot is None or self._values[slot] is _unset:
+            raise KeyError(item)
+        return self._values[slot]
 
     def __str__(self):
         ret = "context:"
+        values = self.values
         for item, value, priority, usage in self.__iter__():
-            ret += f"\n\t- {item}:\n\t\t value: {value(**{arg: self.values[arg] for arg in value.get_input_context().values.keys()}) if value.__class__.__name__=='PendingCall' else value},\n\t\t priority: {priority}\n\t\t shares: {usage}"
+            ret += f"\n\t- {item}:\n\t\t value: {value(**{arg: values[arg] for arg in value.get_input_context().values.keys()}) if value.__class__.__name__=='PendingCall' else value},\n\t\t priority: {priority}\n\t\t shares: {usage}"
         return ret
@@ -1,7 +1,27 @@
-from functools import update_wrapper
+from pyfop.aspect import Aspect
+from collections import OrderedDict
+import hashlib
+import inspect
+import itertools
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import weakref
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
 
-_all_objects = list()  # keeping objects in memory prevents ids from being reused
+_lock = threading.RLock()  # guards the list of hashers and the recency of results under a budget, never taken before a hasher's lock
 _hashers = list()
+_recency = OrderedDict()  # (id(hasher), key) -> (hasher, size) for all cached results, least recently used first, only under a budget
+_used = 0  # bytes of the results in _recency
+_budget = None  # global memory budget of cached results in bytes
+_large = 2**20  # results of at least this many bytes are not cached by plans that release intermediates
+_hashes = dict()  # type -> method computing a hashable description of its instances' contents
+_primitives = (type(None), bool, int, float, complex, str, bytes)
 
 
 class CacheScope(object):
@@ -13,38 +33,430 @@ class CacheScope(object):
 
 
 def cleanup():
-    for hasher in _hashers:
+    with _lock:
+        hashers = list(_hashers)
+    for hasher in hashers:
         hasher.clear_hashed()
-    _all_objects.clear()
 
 
-def obj2id(obj):
-    _all_objects.append(obj)
-    return str(id(obj))
+def budget(nbytes=None):
+    global _budget, _used
+    with _lock:
+        hashers = list(_hashers)
+    recency = OrderedDict()
+    for hasher in hashers:  # results cached without a budget start out in the order of their hashers
+        with hasher._lock:
+            for key, entry in hasher._stored.items():
+                recency[(id(hasher), key)] = (hasher, entry[2])
+    with _lock:
+        _recency.clear()
+        _used = 0
+        if nbytes is not None:
+            _recency.update(recency)
+            _used = sum(size for _, size in recency.values())
+        _budget = nbytes
+    _enforce_budget()
+
+
+def large(nbytes=2**20):
+    global _large
+    _large = nbytes
+
+
+def statistics():
+    with _lock:
+        return {"hits": sum(hasher.hits for hasher in _hashers),
+                "misses": sum(hasher.misses for hasher in _hashers),
+                "evictions": sum(hasher.evictions for hasher in _hashers),
+                "entries": sum(len(hasher._stored) for hasher in _hashers),
+                "usage": _usage(),
+                "budget": _budget}
+
+
+def _usage():
+    return sum(hasher.usage for hasher in _hashers)
+
+
+def _sizeof(value, depth=3):
+    if hasattr(type(value), "nbytes"):  # arrays report the size of their buffers
+        return value.nbytes
+    ret = sys.getsizeof(value)
+    if depth and isinstance(value, (tuple, list, dict, set, frozenset)) and len(value):
+        # containers also hold their items, measured a few levels deep and extrapolated from the first ones of long containers
+        items = value.values() if isinstance(value, dict) else value
+        sizes = [_sizeof(item, depth - 1) for item in itertools.islice(items, 100)]
+        ret += sum(sizes) * len(value) // len(sizes)
+    return ret
+
+
+def _recent(hasher, key, size):
+    # marks a stored result as the most recently used one under a budget
+    global _used
+    with _lock:
+        previous = _recency.pop((id(hasher), key), None)
+        if previous is not None:
+            _used -= previous[1]
+        _recency[(id(hasher), key)] = (hasher, size)
+        _used += size
+
+
+def _discard(hasher, keys):
+    global _used
+    with _lock:
+        for key in keys:
+            previous = _recency.pop((id(hasher), key), None)
+            if previous is not None:
+                _used -= previous[1]
+
+
+def _enforce_budget():
+    # picks victims under the global lock but evicts them under their hashers' locks, so that locks are never nested
+    # in the opposite order of stores
+    global _used
+    while _budget is not None:  # checked before locking, so that caches without a budget never contend
+        with _lock:
+            if _budget is None or not _recency or _used <= _budget:
+                return
+            (_, key), (hasher, size) = _recency.popitem(last=False)
+            _used -= size
+        with hasher._lock:
+            hasher._evict(key)
+
+
+def register_hash(cls, method):
+    _hashes[cls] = method
+
+
+def _array_digest(array):
+    if array.dtype.hasobject:
+        return None
+    buffer = array if array.flags.c_contiguous else array.tobytes()  # contiguous buffers are hashed without copying
+    return "ndarray", array.dtype.str, array.shape, hashlib.blake2b(buffer, digest_size=16).digest()
+
+
+def _content(obj):
+    # returns None for objects whose contents cannot be described, so that they are keyed by id instead
+    cls = type(obj)
+    if cls in _hashes:
+        return cls, _hashes[cls](obj)
+    if cls in _primitives:
+        return cls, obj
+    if cls is tuple or cls is list:
+        ret = tuple(_content(item) for item in obj)
+        return None if None in ret else (cls, ret)
+    if cls is dict:
+        ret = frozenset((_content(key), _content(value)) for key, value in obj.items())
+        return None if any(None in pair for pair in ret) else (cls, ret)
+    if cls is frozenset or cls is set:
+        ret = frozenset(_content(item) for item in obj)
+        return None if None in ret else (cls, ret)
+    if cls.__name__ == "ndarray" and cls.__module__ == "numpy":
+        return _array_digest(obj)
+    for base in cls.__mro__[1:]:
+        if base in _hashes:
+            return base, _hashes[base](obj)
+    return None
+
+
+def _key(obj):
+    ret = _content(obj)
+    return (None, id(obj)) if ret is None else ret
 
 
 def _idfier(*args, **kwargs):
-    return "[" +",".join(obj2id(arg) for arg in args) + "]" + "{" + ",".join(v + ":" + obj2id(kwarg) for v, kwarg in kwargs.items()) + "}"
+    return tuple(id(arg) for arg in args), tuple((v, id(kwarg)) for v, kwarg in kwargs.items())
+
+
+def _contentfier(*args, **kwargs):
+    return tuple(_key(arg) for arg in args), tuple((v, _key(kwarg)) for v, kwarg in kwargs.items())
+
+
+def _encode(part):
+    # stable across processes, unlike the hashes of strings and the iteration order of frozensets
+    if isinstance(part, tuple):
+        return b"(" + b",".join(_encode(item) for item in part) + b")"
+    if isinstance(part, frozenset):
+        return b"{" + b",".join(sorted(_encode(item) for item in part)) + b"}"
+    if isinstance(part, type):
+        return (part.__module__ + "." + part.__qualname__).encode()
+    return repr(part).encode()
+
+
+def _state(value):
+    # describes defaults and closure contents of methods, or returns None if they cannot be described
+    cls = type(value)
+    if cls is tuple or cls is list:
+        ret = tuple(_state(item) for item in value)
+        return None if None in ret else (cls, ret)
+    if cls is dict:
+        ret = frozenset((key, _state(item)) for key, item in value.items())
+        return None if any(item is None for _, item in ret) else (cls, ret)
+    if cls is MethodHasher:
+        return _state(value._method)
+    if cls is Aspect:
+        default = _state(value.default)
+        return None if default is None else (cls, default, value.priority.value, value.context_role)
+    if cls.__name__ == "Metamethod":
+        return _state(value.method)
+    if isinstance(value, type) or hasattr(value, "__code__"):  # methods are identified by name, their code by __wrapped__
+        return "method", getattr(value, "__module__", None), getattr(value, "__qualname__", None)
+    return _content(value)
+
+
+def _fingerprint(method, digest=None):
+    # identifies a method by its qualified name, bytecode, defaults and closure contents, following wrapped methods
+    # and class members, or returns None if some defaults or closure contents cannot be described
+    if digest is None:
+        digest = hashlib.blake2b(digest_size=16)
+        return digest.hexdigest() if _fingerprint(method, digest) else None
+    digest.update((getattr(method, "__module__", None) or "").encode())
+    digest.update((getattr(method, "__qualname__", None) or type(method).__qualname__).encode())
+    if isinstance(method, type):
+        for name, member in sorted(vars(method).items()):
+            if hasattr(member, "__code__") and not _fingerprint(member, digest):
+                return False
+    codes = [method.__code__] if hasattr(method, "__code__") else list()
+    while codes:
+        code = codes.pop()
+        digest.update(code.co_code)
+        digest.update(repr(code.co_names).encode())
+        for const in code.co_consts:
+            if hasattr(const, "co_code"):
+                codes.append(const)
+            else:
+                digest.update(_encode(const))
+    if hasattr(method, "__code__"):
+        state = [getattr(method, "__defaults__", None), getattr(method, "__kwdefaults__", None) or dict()]
+        for cell in getattr(method, "__closure__", None) or ():
+            try:
+                state.append(cell.cell_contents)
+            except ValueError:  # cells of variables not assigned yet
+                state.append(None)
+        state = _state(state)
+        if state is None:
+            return False
+        digest.update(_encode(state))
+    if getattr(method, "__wrapped__", None) is not None:
+        return _fingerprint(method.__wrapped__, digest)
+    return True
+
+
+class DiskCache:
+    def __init__(self, path, maxbytes=None):
+        self.path = os.path.expanduser(path)
+        self.maxbytes = maxbytes
+        os.makedirs(self.path, exist_ok=True)
+
+    def digest(self, fingerprint, key):
+        if any(part[0] is None for part in itertools.chain(key[0], (part for _, part in key[1]))):
+            return None  # arguments keyed by id cannot be recognized by other processes
+        return hashlib.blake2b(fingerprint.encode() + _encode(key), digest_size=20).hexdigest()
+
+    def get(self, digest):
+        for suffix in [".npy", ".pkl"]:
+            path = os.path.join(self.path, digest + suffix)
+            try:
+                if suffix == ".npy":
+                    import numpy
+                    value = numpy.load(path, mmap_mode="r", allow_pickle=False)  # hits map the stored array without copying
+                else:
+                    with open(path, "rb") as file:
+                        value = pickle.load(file)
+                os.utime(path)
+            except (FileNotFoundError, ImportError):
+                continue
+            return True, value
+        return False, None
+
+    def put(self, digest, value):
+        is_array = type(value).__name__ in ["ndarray", "memmap"] and type(value).__module__ == "numpy" \
+            and not value.dtype.hasobject and value.size > 0
+        handle, temp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                if is_array:
+                    import numpy
+                    numpy.save(file, value, allow_pickle=False)
+                else:
+                    pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, os.path.join(self.path, digest + (".npy" if is_array else ".pkl")))  # readers never see partial files
+        except (pickle.PicklingError, TypeError, AttributeError):
+            os.remove(temp)  # results that cannot be pickled are only cached in memory
+            return
+        self.evict()
+
+    def evict(self):
+        if self.maxbytes is None:
+            return
+        with open(os.path.join(self.path, ".lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = list()
+            for entry in os.scandir(self.path):
+                if entry.name.endswith(".npy") or entry.name.endswith(".pkl"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.maxbytes:
+                    break
+                try:
+                    os.remove(path)  # processes that already mapped the file keep reading it
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".npy") or entry.name.endswith(".pkl"):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
 
 
 class MethodHasher:
-    def __init__(self, method):
+    def __init__(self, method, maxsize=None, key="id", persist=None, keep_large=False):
+        if key not in ["id", "content"]:
+            raise Exception("Cache keys can only be \"id\" or \"content\"")
+        if isinstance(persist, str):
+            persist = DiskCache(persist)
         self._method = method
-        self._stored = dict()
-        _hashers.append(self)
+        self._content = key == "content" or persist is not None
+        self._persist = persist
+        self._fingerprint = None
+        self._stored = OrderedDict()  # key -> (value, pinned arguments, size, ids of watched arguments)
+        self._watched = dict()  # id of weakly referenced argument -> (reference, keys depending on it)
+        self.maxsize = maxsize
+        self.keep_large = keep_large
+        self.split = None  # (aspect, reduction, chunks) dividing runs of the method among executor workers
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.usage = 0  # bytes of stored results
+        self._lock = threading.RLock()  # guards the bookkeeping of this cache only, so that different methods do not contend
+        with _lock:
+            _hashers.append(self)
         # update_wrapper(self, method)  # TODO: this throws an exception
 
     def clear_hashed(self):
-        self._stored = dict()
+        with self._lock:
+            keys = list(self._stored)
+            self._stored = OrderedDict()
+            self._watched = dict()
+            self.usage = 0
+        if _budget is not None:
+            _discard(self, keys)
+
+    def _watch(self, arg, key):
+        # keys are built from argument ids, so they must be forgotten before an argument's id can be reused
+        watched = self._watched.get(id(arg))
+        if watched is None:
+            try:
+                ref = weakref.ref(arg, lambda _, arg_id=id(arg): self._forget(arg_id))
+            except TypeError:
+                return False
+            watched = self._watched[id(arg)] = (ref, set())
+        watched[1].add(key)
+        return True
+
+    def _forget(self, arg_id):
+        with self._lock:  # may be called by the garbage collector from any thread
+            watched = self._watched.pop(arg_id, None)
+            if watched is not None:
+                for key in watched[1]:
+                    self._evict(key)
+
+    def _evict(self, key):
+        entry = self._stored.pop(key, None)
+        if entry is None:
+            return
+        self.usage -= entry[2]
+        if _budget is not None:
+            _discard(self, (key,))
+        self.evictions += 1
+        for arg_id in entry[3]:
+            watched = self._watched.get(arg_id)
+            if watched is not None:
+                watched[1].discard(key)
+                if not watched[1]:
+                    del self._watched[arg_id]
+
+    def _store(self, key, value, args):
+        pinned = list()  # arguments that cannot be weakly referenced live as long as the entry
+        watched = list()
+        for arg in args:
+            if self._watch(arg, key):
+                watched.append(id(arg))
+            else:
+                pinned.append(arg)
+        size = _sizeof(value)
+        previous = self._stored.pop(key, None)  # threads that missed the same key store the same result twice
+        if previous is not None:
+            self.usage -= previous[2]
+        self._stored[key] = (value, pinned, size, watched)
+        self.usage += size
+        if _budget is not None:
+            _recent(self, key, size)
+        while self.maxsize is not None and len(self._stored) > self.maxsize:
+            self._evict(next(iter(self._stored)))
+
+    def _lookup(self, args, kwargs):
+        key = _contentfier(*args, **kwargs) if self._content else _idfier(*args, **kwargs)
+        with self._lock:
+            entry = self._stored.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._stored.move_to_end(key)
+                if _budget is not None:
+                    with _lock:
+                        if (id(self), key) in _recency:
+                            _recency.move_to_end((id(self), key))
+                return key, True, entry[0]
+        if self._persist is not None:
+            if self._fingerprint is None:
+                self._fingerprint = _fingerprint(self._method) or ""  # results of undescribable methods are not persisted
+            digest = self._persist.digest(self._fingerprint, key) if self._fingerprint else None
+            found, value = (False, None) if digest is None else self._persist.get(digest)
+            if found:
+                with self._lock:
+                    self.hits += 1
+                    self._store(key, value, ())
+                _enforce_budget()
+                return key, True, value
+        with self._lock:
+            self.misses += 1
+        return key, False, None
+
+    def _remember(self, key, value, args, kwargs):
+        if inspect.isawaitable(value):  # coroutines can only be awaited once, so asynchronous calls cache their results
+            return
+        if self._persist is not None and self._fingerprint:
+            digest = self._persist.digest(self._fingerprint, key)
+            if digest is not None:
+                self._persist.put(digest, value)
+        tracked = itertools.chain(args, kwargs.values())
+        if self._content:  # only arguments keyed by id need to outlive the entry
+            parts = itertools.chain(key[0], (part for _, part in key[1]))
+            tracked = [arg for arg, part in zip(tracked, parts) if part[0] is None]
+        with self._lock:
+            self._store(key, value, tracked)
+        _enforce_budget()
+
+    def _keeps(self, value):
+        return self.keep_large or _large is None or _sizeof(value) < _large
 
     def __call__(self, *args, **kwargs):
-        desc = _idfier(*args, **kwargs)
-        if desc in self._stored:
-            return self._stored[desc]
+        key, found, value = self._lookup(args, kwargs)
+        if found:
+            return value
         value = self._method(*args, **kwargs)
-        self._stored[desc] = value
+        self._remember(key, value, args, kwargs)
         return value
 
 
-def cache(method):
-    return MethodHasher(method)
+def cache(method, maxsize=None, key="id", persist=None, keep_large=False):
+    return MethodHasher(method, maxsize, key, persist, keep_large)
@@ -1,26 +1,27 @@
-from pyfop.aspect import Aspect, Context, Priority
+from pyfop.aspect import Aspect, Context, Priority, _extended
 import pyfop.argparser as argparser
 from functools import wraps
-from pyfop.cache import cache
+from types import MappingProxyType
+import itertools
+from pyfop.cache import cache, _idfier, _contentfier
+import pyfop.profiling as profiling
+from weakref import WeakValueDictionary
+import weakref
+import threading
+import time
 
 
 def _isfop(val, inherits):
     return isinstance(val, Aspect) or isinstance(val, PendingCall) or (isinstance(val, Metamethod) and val not in inherits)
 
 
-class PendingCall:
-    def __init__(self, _pyfop_method, *args, supercontext=None, inherits=(), **kwargs):
-        self.method = _pyfop_method
-        self.args = args
-        self.kwargs = kwargs
-        self.inject_aspects_to_context = dict()
-        self.supercontext = supercontext
-        self.inherits = inherits
+_empty = MappingProxyType(dict())
+_attributes = dict()  # attribute name -> method retrieving it from results, shared by all calls
+_interning = threading.Lock()
 
-    def __getattribute__(self, name):
-        if name in ["method", "args", "kwargs", "supercontext", "inject_aspects_to_context", "inherits"] or name in dir(PendingCall):
-            return object.__getattribute__(self, name)
 
+def _attribute(name):
+    if name not in _attributes:
         def future_method(*args, fop_method_result, **kwargs):
             attr = getattr(fop_method_result, name)
             if callable(attr):
@@ -29,8 +30,74 @@ class PendingCall:
                 if args or kwargs:
                     raise Exception("Do not provide arguments when casting attributes.")
                 return attr
+        return _attributes.setdefault(name, future_method)  # threads racing here share the first method
+    return _attributes[name]
+
+
+_graph_slots = dict()  # id of an evaluated call -> (weak reference to it, aspect slots of its graph)
+
+
+def _context(call):
+    entry = _graph_slots.get(id(call))
+    return Context(None if entry is None else entry[1])  # preallocated for the aspects of previous evaluations
+
+
+def _intern(call, context):
+    if id(call) not in _graph_slots and context.slots:
+        _graph_slots[id(call)] = (weakref.ref(call, lambda _, key=id(call): _graph_slots.pop(key, None)), dict(context.slots))
+
+
+class _Layer:  # aspects injected by PendingCall.aspects, stacked over those of the specialized call
+    __slots__ = ("aspects", "parent", "flat")
 
-        return lazy(future_method, fop_method_result=self)
+    def __init__(self, aspects, parent):
+        self.aspects = aspects
+        self.parent = parent
+        self.flat = None
+
+    def _flatten(self):
+        # resolved on first use, with later layers overriding earlier ones
+        if self.flat is None:
+            layers = [self]
+            while isinstance(layers[-1].parent, _Layer):
+                layers.append(layers[-1].parent)
+            flat = dict(layers[-1].parent)
+            for layer in reversed(layers):
+                flat.update(layer.aspects)
+            self.flat = flat
+        return self.flat
+
+    def items(self):
+        return self._flatten().items()
+
+    def values(self):
+        return self._flatten().values()
+
+    def keys(self):
+        return self._flatten().keys()
+
+    def __iter__(self):
+        return iter(self._flatten())
+
+    def __len__(self):
+        return len(self._flatten())
+
+
+class PendingCall:
+    __slots__ = ("method", "args", "kwargs", "inject_aspects_to_context", "supercontext", "inherits", "__weakref__")
+
+    def __init__(self, _pyfop_method, *args, supercontext=None, inherits=(), **kwargs):
+        self.method = _pyfop_method
+        self.args = args
+        self.kwargs = kwargs
+        self.inject_aspects_to_context = _empty
+        self.supercontext = supercontext
+        self.inherits = inherits
+
+    def __getattr__(self, name):  # only called for names that are not attributes of calls
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        return Metamethod(_attribute(name), fop_method_result=self)
 
     def __getitem__(self, item):
         return getitem(self, item)
@@ -92,19 +159,32 @@ class PendingCall:
     def __call__(self, **kwargs):
         return self.call(**kwargs)
 
+    def __reduce__(self):
+        # pickles the graph as a versioned list of calls, referring to methods by module and qualified name
+        from pyfop.serialization import _table, _graph
+        return _graph, _table(self)
+
     def role(self, context_role):
         return Aspect(self, role=context_role)
 
     def get_input_context(self, **kwargs):
-        context = Context()
+        context = _context(self)
         context.extend(kwargs, Priority.HIGH)
         self._gather_aspects(context)
+        _intern(self, context)
         return context
 
-    def call(self, **kwargs):
-        context = Context()
+    def call(self, executor=None, **kwargs):
+        if executor is not None:
+            return self.compile()(executor, **kwargs)
+        context = _context(self)
+        context.profile = profile = profiling._active
+        start = None if profile is None else time.perf_counter()
         context.extend(kwargs, Priority.HIGH)
         self._gather_aspects(context)
+        _intern(self, context)
+        if profile is not None:
+            profile.record("gather", "aspects", start, aspects=len(context.values), nodes=len(context.visited))
         ret = self._call(context)
         #if isinstance(ret, PendingCall):
         #    ret._gather_aspects(context)
@@ -113,96 +193,226 @@ class PendingCall:
             context.catch_unused()
         return ret
 
+    def sweep(self, **batches):
+        return self.compile().sweep(**batches)
+
+    def grid(self, **batches):
+        return self.compile().grid(**batches)
+
+    async def acall(self, **kwargs):
+        return await self.compile().acall(**kwargs)
+
+    def specialize(self, **fixed):
+        return self.compile().specialize(**fixed)
+
+    def compile(self, incremental=False, fuse=False, release=False):
+        from pyfop.plan import ExecutionPlan
+        return ExecutionPlan(self, incremental, fuse, release)
+
     def aspects(self, **kwargs):
+        # specializes the call by stacking a layer of injected aspects, without copying or gathering the graph
         if not kwargs:
             return self
-        ret = PendingCall(self.method, *self.args, self.supercontext, **self.kwargs)
-        for key, value in kwargs.items():
-            ret.inject_aspects_to_context[key] = Aspect(value, priority=Priority.HIGH)
-        for key, value in kwargs.items():
-            if isinstance(value, PendingCall) and key not in self.kwargs:
-                ret.inject_aspects_to_context = ret.inject_aspects_to_context | value.get_input_context().to_aspects()
+        ret = PendingCall.__new__(PendingCall)
+        ret.method = self.method
+        ret.args = self.args
+        ret.kwargs = self.kwargs
+        ret.inherits = self.inherits
         ret.supercontext = True
+        ret.inject_aspects_to_context = _Layer({key: Aspect(value, priority=Priority.HIGH) for key, value in kwargs.items()},
+                                               self.inject_aspects_to_context)
         return ret
 
     def _gather_aspects(self, context):
-        defaults = argparser.parse_defaults(self.method)
-        positional, unnamed = argparser.parse_positional(self.method, self.args)
+        # walks the graph with an explicit stack in the same order as a recursive walk, so that deep graphs fit
+        from pyfop.utils import builder
+        stack = [self]
+        while stack:
+            call = stack.pop()
+            if id(call) in context.visited:
+                continue
+            context.visited.add(id(call))
+            if isinstance(call, Metamethod):
+                stack.append(builder(call.method))
+                continue
+            stack.extend(reversed(call._add_aspects(context)))
+
+    def _add_aspects(self, context):
+        # adds the aspects of this call to the context and returns the calls to gather next
+        descriptor = argparser.describe(self.method)
+        defaults = descriptor.defaults
+        positional, unnamed = descriptor.positional(self.args)
         kwargs = argparser.combine(defaults, positional, self.kwargs)
-        for arg, val in defaults.items():
+        for arg in descriptor.aspects:  # aspects are named by arguments instead of assigning names to shared defaults
+            val = kwargs[arg]
             if isinstance(val, Aspect):
-                val.name = arg
-                if isinstance(kwargs[arg], Aspect):
-                    kwargs[arg].name = arg
-                context.add(val.extended_name(), kwargs[arg], is_default=True)
-                kwargs[arg] = val
+                context.add(_extended(arg, val), val.default, val.priority, is_default=True)
+            else:
+                context.add(_extended(arg, defaults[arg]), val, Priority.HIGH, is_default=True)
+            kwargs[arg] = defaults[arg]
         for arg, val in kwargs.items():
             if isinstance(val, Aspect):
-                val.name = arg
-                if isinstance(kwargs[arg], Aspect):
-                    kwargs[arg].name = arg
-                context.add(val.extended_name(), kwargs[arg], is_default=True)
-                kwargs[arg] = val
-        for arg, val in self.inject_aspects_to_context.items():
+                context.add(_extended(arg, val), val.default, val.priority, is_default=True)
+        injected = self.inject_aspects_to_context.items()
+        for arg, val in injected:
             if isinstance(val, Aspect):
-                val.name = arg
-                context.add(val.extended_name(), val, is_default=False)
-        for val in kwargs.values():
-            #print(self.method, val, isinstance(val, PendingCall))
-            if isinstance(val, PendingCall):
-                val._gather_aspects(context)
-            if isinstance(val, Metamethod) and _isfop(val, self.inherits):
-                from pyfop.utils import builder
-                builder(val.method)._gather_aspects(context)
-        for val in self.inject_aspects_to_context.values():
-            if isinstance(val, PendingCall):
-                val._gather_aspects(context)
-            if isinstance(val, Metamethod) and _isfop(val, self.inherits):
-                from pyfop.utils import builder
-                builder(val.method)._gather_aspects(context)
+                context.add(_extended(arg, val), val.default, val.priority, is_default=False)
+        ret = [val for val in itertools.chain(kwargs.values(), self.inject_aspects_to_context.values())
+               if isinstance(val, PendingCall) or (isinstance(val, Metamethod) and _isfop(val, self.inherits))]
+        ret.extend(val.default for arg, val in injected  # injected calls contribute their aspects too
+                   if isinstance(val, Aspect) and isinstance(val.default, PendingCall) and arg not in self.kwargs)
+        return ret
 
     def _call(self, context):
-        positional, unnamed = argparser.parse_positional(self.method, self.args)
-        kwargs = argparser.combine(argparser.parse_defaults(self.method),
-                                   positional,
-                                   self.kwargs)
-        for arg, val in kwargs.items():
+        # evaluates dependencies before their consumers with an explicit stack instead of recursion
+        from pyfop.utils import builder
+        results = context.results
+        profile = context.profile
+        stack = [(self, None)]
+        while stack:
+            call, arguments = stack.pop()
+            if id(call) in results:
+                continue
+            if isinstance(call, Metamethod):
+                built = builder(call.method)
+                if arguments is None:
+                    stack.append((call, True))
+                    stack.append((built, None))
+                else:
+                    results[id(call)] = (call, results[id(built)][1])
+                continue
+            if arguments is None:
+                arguments = call._arguments()
+                stack.append((call, arguments))
+                stack.extend((val, None) for val in reversed(call._dependencies(arguments, context)))
+                continue
+            unnamed, kwargs = arguments
+            start = None if profile is None else time.perf_counter()
+            unnamed = [call._resolve(val, context) for val in unnamed]
+            kwargs = {arg: call._resolve(val, context, arg) for arg, val in kwargs.items()}
+            if profile is None:
+                ret = call.method(*unnamed, **kwargs)
+            else:
+                ret = profile.run(call.method, unnamed, kwargs, time.perf_counter()-start)
+            results[id(call)] = (call, ret)  # also keeps the call alive so that its id is not reused
+        return results[id(self)][1]
+
+    def _arguments(self):
+        descriptor = argparser.describe(self.method)
+        positional, unnamed = descriptor.positional(self.args)
+        kwargs = argparser.combine(descriptor.defaults, positional, self.kwargs)
+        return unnamed, kwargs
+
+    def _dependencies(self, arguments, context):
+        # calls that need to be evaluated before this one, in the order of its arguments
+        ret = list()
+        for arg, val in itertools.chain(((None, val) for val in arguments[0]), arguments[1].items()):
+            if not _isfop(val, self.inherits):
+                continue
             if isinstance(val, Aspect):
-                val.name = arg
-        # print(self.method.__name__, kwargs)
-        unnamed = [val._call(context) if _isfop(val, self.inherits) else val for val in unnamed]
-        kwargs = {arg: val._call(context) if _isfop(val, self.inherits) else val for arg, val in kwargs.items()}
-        return self.method(*unnamed, **kwargs)
+                val = context.peek(val.name if arg is None else arg)
+                if not isinstance(val, PendingCall):
+                    continue
+            ret.append(val)
+        return ret
+
+    def _resolve(self, val, context, arg=None):
+        if not _isfop(val, self.inherits):
+            return val
+        if isinstance(val, Aspect):
+            val = context.get(val.name if arg is None else arg)
+            if not isinstance(val, PendingCall):
+                return val
+        return context.results[id(val)][1]
 
 
 class Metamethod:
+    __slots__ = ("method", "supplementary_args", "supplementary_kwargs", "inherits", "interned", "keyfier", "__weakref__")
+
     def __init__(self, method, *supplementary_args, **supplementary_kwargs):
         self.method = method
         self.supplementary_args = supplementary_args
         self.supplementary_kwargs = supplementary_kwargs
         self.inherits = []
+        self.interned = None  # argument keys -> live calls, if identical calls are hash-consed
+        self.keyfier = None
+        argparser.describe(method)  # compile the parameter descriptor once when wrapping
 
     def _call(self, context):
+        if id(self) in context.results:
+            return context.results[id(self)][1]
         from pyfop.utils import builder
-        return builder(self.method)._call(context)
+        ret = builder(self.method)._call(context)
+        context.results[id(self)] = (self, ret)
+        return ret
 
     def __call__(self, *args, **kwargs):
-        return PendingCall(self.method, *(self.supplementary_args+args), **(self.supplementary_kwargs | kwargs), inherits=self.inherits)
+        if self.supplementary_args:
+            args = self.supplementary_args + args
+        if self.supplementary_kwargs:
+            kwargs = self.supplementary_kwargs | kwargs
+        if self.interned is None:
+            return PendingCall(self.method, *args, inherits=self.inherits, **kwargs)
+        key = self.keyfier(*args, **kwargs)
+        with _interning:
+            ret = self.interned.get(key)
+            if ret is None:  # interned calls keep their arguments alive, so argument ids in keys are not reused
+                ret = self.interned[key] = PendingCall(self.method, *args, inherits=self.inherits, **kwargs)
+        return ret
+
+    def __reduce__(self):
+        from pyfop.serialization import _metamethod, _lazy
+        return _lazy, (_metamethod(self, lambda val: val),)
+
+    def intern(self, key="id"):
+        if key not in ["id", "content"]:
+            raise Exception("Intern keys can only be \"id\" or \"content\"")
+        self.interned = WeakValueDictionary()
+        self.keyfier = _contentfier if key == "content" else _idfier
+        return self
+
+
+_lazy_types = (Aspect, PendingCall, Metamethod)
 
 
 def meta(*inherits):
     def inner(method):
         if not isinstance(method, Metamethod):
             raise Exception("Can only wrap @lazy or @lazy_no_cache methods with @meta(...)")
+        interned = method.interned is not None
+        key = "content" if method.keyfier is _contentfier else "id"
         method = Metamethod(method.method, *method.supplementary_args, **method.supplementary_kwargs)
         method.inherits = set(inherits)
-        return method
+        return method.intern(key) if interned else method
     return inner
 
 
-def lazy(method, *supplementary_args, **supplementary_kwargs):
-    method = cache(method)
-    return Metamethod(method, *supplementary_args, **supplementary_kwargs)
+_options = {"maxsize": None, "cache_key": "id", "persist": None, "intern": False, "cache_large": False,
+            "split": None, "reduce": "sum", "chunks": None}  # options of lazy methods and their defaults
+
+
+def lazy(method=None, *supplementary_args, **kwargs):
+    if method is None:  # only options are accepted by @lazy(...)
+        for option in kwargs:
+            if option not in _options:
+                raise TypeError("lazy() got an unexpected keyword argument '"+option+"'")
+        return lambda method: _lazy(method, (), {}, **(_options | kwargs))
+    # options named like parameters of the method are supplementary arguments of the method instead
+    names = argparser.describe(method).names
+    options = {option: kwargs.pop(option) if option in kwargs and option not in names else default
+               for option, default in _options.items()}
+    return _lazy(method, supplementary_args, kwargs, **options)
+
+
+def _lazy(method, supplementary_args, supplementary_kwargs, maxsize, cache_key, persist, intern, cache_large, split,
+          reduce, chunks):
+    if split is not None and reduce not in ["sum", "mean", "concat"] and not callable(reduce):
+        raise Exception("Split results can only be reduced with \"sum\", \"mean\", \"concat\" or a method")
+    method = cache(method, maxsize=maxsize, key=cache_key, persist=persist, keep_large=cache_large)
+    if split is not None:
+        method.split = (split, reduce, chunks)
+    method = Metamethod(method, *supplementary_args, **supplementary_kwargs)
+    return method.intern(cache_key) if intern else method
     #@wraps(method)
     #def wrapper(*args, **kwargs):
     #    return PendingCall(method, *(supplementary_args+args), **(supplementary_kwargs | kwargs))
@@ -217,18 +427,43 @@ def lazy_no_cache(method, *supplementary_args, **supplementary_kwargs):
     return Metamethod(method, *supplementary_args, **supplementary_kwargs)
 
 
+def _direct(method):
+    # methods without aspects or lazy defaults have nothing to gather when their arguments are plain values
+    descriptor = argparser.describe(method)
+    return not any(isinstance(val, _lazy_types) for val in descriptor.defaults.values())
+
+
+def _plain(args, kwargs):
+    for val in args:
+        if isinstance(val, _lazy_types):
+            return False
+    for val in kwargs.values():
+        if isinstance(val, _lazy_types):
+            return False
+    return profiling._active is None  # profiled calls take the full path so that they are recorded
+
+
 def eager_no_cache(method):
+    direct = _direct(method)
+
     @wraps(method)
     def wrapper(*args, **kwargs):
+        if direct and _plain(args, kwargs):
+            return method(*args, **kwargs)
         return PendingCall(method, *args, **kwargs).call()
     return wrapper
 
 
-def eager(method):
-    method = cache(method)
+def eager(method=None, maxsize=None, cache_key="id", persist=None):
+    if method is None:
+        return lambda method: eager(method, maxsize=maxsize, cache_key=cache_key, persist=persist)
+    method = cache(method, maxsize=maxsize, key=cache_key, persist=persist)
+    direct = _direct(method)
 
     @wraps(method)
     def wrapper(*args, **kwargs):
+        if direct and _plain(args, kwargs):
+            return method(*args, **kwargs)
         return PendingCall(method, *args, **kwargs).call()
     return wrapper
 
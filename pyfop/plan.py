@@ -0,0 +1,699 @@
+from pyfop.aspect import Aspect, Context, Priority, _name, _value, _priority, _extended
+from pyfop.execution import PendingCall, Metamethod, _isfop, _empty
+import pyfop.execution as execution
+from pyfop.cache import MethodHasher, _key
+from pyfop.serialization import _portable, _picklable
+import pyfop.argparser as argparser
+import pyfop.profiling as profiling
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import asyncio
+import functools
+import hashlib
+import inspect
+import itertools
+import operator
+import os
+import threading
+
+_CONSTANT = 0
+_RESULT = 1
+_ASPECT = 2
+
+
+_operators = {id(execution.neg.method): (operator.neg, "negative", ("x",)),  # fusible methods by id of their cache
+              id(execution._abs.method): (abs, "absolute", ("x",)),
+              id(execution.add.method): (operator.add, "add", ("x", "y")),
+              id(execution.sub.method): (operator.sub, "subtract", ("x", "y")),
+              id(execution.mul.method): (operator.mul, "multiply", ("x", "y")),
+              id(execution.div.method): (operator.truediv, "true_divide", ("x", "y")),
+              id(execution.pow.method): (operator.pow, "power", ("x", "y"))}
+
+
+def _operands(node):
+    method, unnamed, named = node
+    entry = _operators.get(id(method))
+    if entry is None or unnamed or len(named) != len(entry[2]):
+        return None
+    specs = {arg: (kind, payload) for arg, kind, payload in named}
+    return [specs[arg] for arg in entry[2]] if set(specs) == set(entry[2]) else None
+
+
+def _isarray(value):
+    return type(value).__name__ == "ndarray" and type(value).__module__ == "numpy" and not value.dtype.hasobject
+
+
+class _Kernel:  # evaluates a fused tree of arithmetic operators in postfix order
+    def __init__(self, program):
+        self.program = program  # input positions and (operator, ufunc name, operand names) entries
+
+    def __call__(self, *inputs):
+        if any(_isarray(value) for value in inputs) and all(_isarray(value) or isinstance(value, (int, float, complex))
+                                                            or type(value).__module__ == "numpy" for value in inputs):
+            return self._arrays(inputs)
+        stack = list()
+        for step in self.program:
+            if step.__class__ is int:
+                stack.append(inputs[step])
+            elif len(step[2]) == 1:
+                stack[-1] = step[0](stack[-1])
+            else:
+                y = stack.pop()
+                stack[-1] = step[0](stack[-1], y)
+        return stack[-1]
+
+    def _arrays(self, inputs):
+        # temporaries created by the kernel are overwritten by later operators instead of allocating new arrays
+        import numpy
+        stack = list()
+        owned = list()
+        for step in self.program:
+            if step.__class__ is int:
+                stack.append(inputs[step])
+                owned.append(False)
+                continue
+            arity = len(step[2])
+            operands = stack[-arity:]
+            if not any(isinstance(operand, numpy.ndarray) for operand in operands):
+                # scalar subexpressions keep Python semantics, such as unbounded ints and weak float types
+                result = step[0](*operands)
+            else:
+                out = None
+                for value, own in zip(operands, owned[-arity:]):
+                    if own and value.dtype.kind in "fc" and numpy.result_type(*operands) == value.dtype \
+                            and numpy.broadcast_shapes(*(numpy.shape(operand) for operand in operands)) == value.shape:
+                        out = value
+                        break
+                ufunc = getattr(numpy, step[1])
+                result = ufunc(*operands) if out is None else ufunc(*operands, out=out)
+            del stack[-arity:]
+            del owned[-arity:]
+            stack.append(result)
+            owned.append(type(result) is numpy.ndarray)
+        return stack[-1]
+
+
+def _chunks(split, kwargs, workers, seed):
+    # divides the split aspect into one chunk per worker, each seeded reproducibly from the seed aspect
+    name, _, count = split
+    total = kwargs[name]
+    count = max(1, min(total, count or workers))
+    sizes = [total // count + (chunk < total % count) for chunk in range(count)]
+    if seed is None:
+        return sizes, None
+    return sizes, [int.from_bytes(hashlib.blake2b(repr((seed, chunk)).encode(), digest_size=4).digest(), "little")
+                   for chunk in range(count)]
+
+
+def _combine(reduce, parts, sizes):
+    if reduce == "sum":
+        return functools.reduce(operator.add, parts)
+    if reduce == "mean":  # weighted by chunk sizes, since chunks may differ by one
+        return functools.reduce(operator.add, [part * size for part, size in zip(parts, sizes)]) / sum(sizes)
+    if reduce == "concat":
+        if _isarray(parts[0]):
+            import numpy
+            return numpy.concatenate(parts)
+        return functools.reduce(operator.add, parts)
+    return reduce(parts)
+
+
+class _Deferred:  # aspect value that is a lazy call, compiled and run at most once per bound call
+    __slots__ = ("call", "plan", "result", "done")
+
+    def __init__(self, call):
+        self.call = call
+        self.plan = None
+        self.result = None
+        self.done = False
+
+    def compiled(self):
+        if self.plan is None:
+            self.plan = self.call.compile()
+        return self.plan
+
+    def get(self, values):
+        if not self.done:
+            self.result = self.compiled()._run(values)
+            self.done = True
+        return self.result
+
+
+def _constant(value, **aspects):  # residual of graphs determined by fixed aspects, or carrier of aspects set by calls that ran
+    return value
+
+
+class _Recorder(Context):  # records context additions instead of resolving them
+    def __init__(self, adds):
+        super().__init__()
+        self.adds = adds
+
+    def add(self, arg, val, default_priority=Priority.HIGH, is_default=False):
+        self.adds.setdefault(_name(arg, val), list()).append((_value(arg, val), _priority(val, default_priority), is_default))
+
+
+class ExecutionPlan:
+    def __init__(self, pending, incremental=False, fuse=False, release=False):
+        self.nodes = list()  # (method, positional specs, keyword specs) in topological order
+        self.adds = dict()  # context additions per aspect name in gathering order
+        self.reads = set()  # aspect names read while executing nodes
+        self.dependencies = list()  # positions of the nodes whose results each node uses
+        self.consumers = list()  # positions of the nodes using each node's result
+        self.aspect_dependencies = list()  # names of the aspects each node reads, directly or through its dependencies
+        self.calls = list()  # the call compiled into each node, until fusion merges nodes
+        self.check_unused = pending.supercontext is None
+        self._compile(pending)
+        if fuse:
+            self._fuse()
+        self._link()
+        self._resolve()
+        self.incremental = incremental
+        self.release = release  # whether results are dropped once their last consumer has run
+        self._last = [None] * len(self.nodes)  # (aspect values, their content keys, result) of each node's last run
+        self._lock = threading.Lock()
+
+    def _add(self, name, value, priority, is_default):
+        self.adds.setdefault(name, list()).append((value, priority, is_default))
+
+    def _spec(self, val, inherits, builders, name=None):
+        if isinstance(val, Aspect):
+            name = val.name if name is None else name
+            self.reads.add(name)
+            return _ASPECT, name
+        if isinstance(val, PendingCall):
+            return _RESULT, val
+        if isinstance(val, Metamethod) and _isfop(val, inherits):
+            if id(val) not in builders:
+                from pyfop.utils import builder
+                builders[id(val)] = builder(val.method)
+            return _RESULT, builders[id(val)]
+        return _CONSTANT, val
+
+    def _expand(self, pending, builders):
+        descriptor = argparser.describe(pending.method)
+        positional, unnamed = descriptor.positional(pending.args)
+        kwargs = argparser.combine(descriptor.defaults, positional, pending.kwargs)
+        gathered = dict(kwargs) if descriptor.aspects else kwargs
+        for arg in descriptor.aspects:
+            default = descriptor.defaults[arg]
+            val = kwargs[arg]
+            if isinstance(val, Aspect):
+                self._add(_extended(arg, val), val.default, val.priority, True)
+            else:
+                self._add(_extended(arg, default), val, Priority.HIGH, True)
+            gathered[arg] = default
+        for arg, val in gathered.items():
+            if isinstance(val, Aspect):
+                self._add(_extended(arg, val), val.default, val.priority, True)
+        for arg, val in pending.inject_aspects_to_context.items():
+            if isinstance(val, Aspect):
+                self._add(_extended(arg, val), val.default, val.priority, False)
+        for arg, val in pending.inject_aspects_to_context.items():  # injected calls are gathered but run only if read
+            if isinstance(val, Aspect) and isinstance(val.default, PendingCall) and arg not in pending.kwargs:
+                val.default._gather_aspects(_Recorder(self.adds))
+            if isinstance(val, PendingCall):
+                val._gather_aspects(_Recorder(self.adds))
+            if isinstance(val, Metamethod) and _isfop(val, pending.inherits):
+                from pyfop.utils import builder
+                builder(val.method)._gather_aspects(_Recorder(self.adds))
+        named = [(arg,)+self._spec(val, pending.inherits, builders, arg) for arg, val in kwargs.items()]
+        unnamed = [self._spec(val, pending.inherits, builders) for val in unnamed]
+        children = [payload for _, kind, payload in named if kind == _RESULT]
+        children.extend(payload for kind, payload in unnamed if kind == _RESULT)
+        return pending.method, unnamed, named, children
+
+    def _compile(self, root):
+        index = dict()  # id of each compiled call -> position in self.nodes
+        expanded = dict()
+        builders = dict()
+        stack = [root]
+        while stack:
+            pending = stack[-1]
+            if id(pending) in index:
+                stack.pop()
+                continue
+            if id(pending) not in expanded:
+                expanded[id(pending)] = self._expand(pending, builders)
+                stack.extend(child for child in reversed(expanded[id(pending)][3]) if id(child) not in index)
+                continue
+            stack.pop()
+            method, unnamed, named, _ = expanded.pop(id(pending))
+            for i, spec in enumerate(unnamed):  # replace calls with the positions of their nodes
+                if spec[0] == _RESULT:
+                    unnamed[i] = (_RESULT, index[id(spec[1])])
+            for i, spec in enumerate(named):
+                if spec[1] == _RESULT:
+                    named[i] = (spec[0], _RESULT, index[id(spec[2])])
+            index[id(pending)] = len(self.nodes)
+            self.nodes.append((method, tuple(unnamed), tuple(named)))
+            self.calls.append(pending)
+
+    def _link(self):
+        for node, (_, unnamed, named) in enumerate(self.nodes):
+            dependencies = set()
+            reads = set()
+            for kind, payload in itertools.chain(unnamed, (spec[1:] for spec in named)):
+                if kind == _RESULT:
+                    dependencies.add(payload)
+                elif kind == _ASPECT:
+                    reads.add(payload)
+            for dependency in dependencies:
+                self.consumers[dependency].append(node)
+                reads.update(self.aspect_dependencies[dependency])
+            self.dependencies.append(dependencies)
+            self.consumers.append(list())
+            self.aspect_dependencies.append(tuple(sorted(reads, key=str)) if reads else ())
+
+    def _fuse(self):
+        # replaces trees of arithmetic operators whose intermediate results are used only once with single kernels
+        uses = [0] * len(self.nodes)
+        for _, unnamed, named in self.nodes:
+            for kind, payload in itertools.chain(unnamed, (spec[1:] for spec in named)):
+                if kind == _RESULT:
+                    uses[payload] += 1
+        operands = [_operands(node) for node in self.nodes]
+        absorbed = [False] * len(self.nodes)
+        for node, specs in enumerate(operands):
+            if specs is not None:
+                for kind, payload in specs:
+                    if kind == _RESULT and uses[payload] == 1 and operands[payload] is not None:
+                        absorbed[payload] = True
+        nodes = list()
+        positions = dict()  # old position -> new position of kept nodes
+        for node, (method, unnamed, named) in enumerate(self.nodes):
+            if absorbed[node]:
+                continue
+            if operands[node] is not None and any(kind == _RESULT and absorbed[payload] for kind, payload in operands[node]):
+                program = list()
+                unnamed = list()
+                stack = [(False, node)]
+                while stack:  # postfix order without recursion, since operator chains can be very long
+                    emit, item = stack.pop()
+                    if emit is None:  # inputs of the kernel
+                        program.append(len(unnamed))
+                        unnamed.append(item)
+                    elif emit:
+                        program.append(_operators[id(self.nodes[item][0])])
+                    else:
+                        stack.append((True, item))
+                        stack.extend((False, payload) if kind == _RESULT and absorbed[payload] else (None, (kind, payload))
+                                     for kind, payload in reversed(operands[item]))
+                method = _Kernel(program)
+                named = ()
+            positions[node] = len(nodes)
+            nodes.append((method, tuple((kind, positions[payload] if kind == _RESULT else payload) for kind, payload in unnamed),
+                          tuple((arg, kind, positions[payload] if kind == _RESULT else payload) for arg, kind, payload in named)))
+        self.nodes = nodes
+        self.calls = None
+
+    def _replay(self, name, context):
+        for value, priority, is_default in self.adds.get(name, ()):
+            context.add(name, value, priority, is_default)
+        return context
+
+    def _resolve(self):
+        # aspects are resolved independently per name, so values not overridden at call time are resolved once here
+        self.values = dict()
+        self.errors = dict()
+        self.unused = list()
+        self.contested = {name for name, adds in self.adds.items()  # only these can interact with call arguments
+                          if any(priority.value >= Priority.HIGH.value for _, priority, _ in adds)}
+        for name in self.adds:
+            try:
+                context = self._replay(name, Context())
+            except Exception as e:
+                self.errors[name] = e
+                continue
+            if name in context:
+                self.values[name] = context[name]
+            if context.usage(name, 1) == 0 and name not in self.reads:
+                self.unused.append(name)
+        self.deferred = [name for name, value in self.values.items() if isinstance(value, PendingCall)]
+
+    def bind(self, **kwargs):
+        return self._bind(kwargs, self.errors)
+
+    def _bind(self, kwargs, errors):
+        for name, error in errors.items():
+            if name not in kwargs:
+                raise type(error)(*error.args)
+        values = self.values
+        unused = self.unused
+        if kwargs:
+            values = dict(values)
+            unused = [name for name in unused if name not in kwargs]
+            for name, value in kwargs.items():
+                if name not in self.contested:
+                    values[name] = value
+                    if name not in self.reads:
+                        unused.append(name)
+                    continue
+                context = Context()
+                context.extend({name: value}, Priority.HIGH)
+                self._replay(name, context)
+                values[name] = context[name]
+                if context.usage(name) == 0 and name not in self.reads:
+                    unused.append(name)
+        deferred = [name for name in itertools.chain(self.deferred, kwargs) if isinstance(values.get(name, None), PendingCall)]
+        if deferred:  # each lazy value is compiled and run once, however many nodes read it
+            values = dict(values) if values is self.values else values
+            for name in deferred:
+                values[name] = _Deferred(values[name])
+        if self.check_unused and unused:
+            dynamic = self._dynamic_reads(values)
+            for name in unused:
+                if name not in dynamic:
+                    raise Exception("Unused argument: "+name+" (no aspect with such name)")
+        return values
+
+    def _dynamic_reads(self, values):
+        # aspect values that are themselves lazy calls read further aspects when they run
+        ret = set()
+        for name in self.reads:
+            if isinstance(values.get(name, None), _Deferred):
+                plan = values[name].compiled()
+                ret |= plan.reads | plan._dynamic_reads(values)
+        return ret
+
+    def _read(self, name, values):
+        value = values.get(name, None)
+        if value.__class__ is _Deferred:
+            value = value.get(values)
+        return value
+
+    def _unchanged(self, node, keys):
+        # values are compared by content where cache keys can describe them, and by identity otherwise
+        last = self._last[node]
+        return last is not None and last[1] == keys
+
+    def _run_incremental(self, values):
+        # nodes rerun only when the values of the aspects they depend on change between calls
+        with self._lock:  # concurrent calls would interleave their updates of self._last
+            results = list()
+            for node in range(len(self.nodes)):
+                current = [values.get(name, None) for name in self.aspect_dependencies[node]]
+                keys = [_key(value) for value in current]
+                if self._unchanged(node, keys):
+                    results.append(self._last[node][2])
+                    continue
+                args, kwargs = self._arguments(node, results, values)
+                results.append(self.nodes[node][0](*args, **kwargs))
+                if not any(isinstance(value, _Deferred) for value in current):  # these may read any aspect
+                    self._last[node] = (current, keys, results[-1])  # values keyed by id are kept alive
+            return results[-1]
+
+    def _run(self, values):
+        if self.incremental:
+            return self._run_incremental(values)
+        if self.release:
+            return self._run_released(values)
+        results = list()
+        append = results.append
+        read = self._read
+        for method, unnamed, named in self.nodes:
+            args = [payload if kind == _CONSTANT else results[payload] if kind == _RESULT else read(payload, values)
+                    for kind, payload in unnamed]
+            kwargs = {arg: payload if kind == _CONSTANT else results[payload] if kind == _RESULT else read(payload, values)
+                      for arg, kind, payload in named}
+            append(method(*args, **kwargs))
+        return results[-1]
+
+    def _run_released(self, values):
+        # intermediate results are dropped as soon as all their consumers have run, and large ones are not cached
+        results = [None] * len(self.nodes)
+        remaining = [len(consumers) for consumers in self.consumers]
+        for node in range(len(self.nodes)):
+            method = self.nodes[node][0]
+            args, kwargs = self._arguments(node, results, values)
+            if isinstance(method, MethodHasher):
+                key, found, result = method._lookup(args, kwargs)
+                if not found:
+                    result = method._method(*args, **kwargs)
+                    if method._keeps(result):
+                        method._remember(key, result, args, kwargs)
+            else:
+                result = method(*args, **kwargs)
+            del args, kwargs
+            results[node] = result
+            for dependency in self.dependencies[node]:
+                remaining[dependency] -= 1
+                if remaining[dependency] == 0:
+                    results[dependency] = None
+        return results[-1]
+
+    def _arguments(self, node, results, values):
+        _, unnamed, named = self.nodes[node]
+        args = [payload if kind == _CONSTANT else results[payload] if kind == _RESULT else self._read(payload, values)
+                for kind, payload in unnamed]
+        kwargs = {arg: payload if kind == _CONSTANT else results[payload] if kind == _RESULT else self._read(payload, values)
+                  for arg, kind, payload in named}
+        return args, kwargs
+
+    def _schedule(self, values, executor):
+        # submits each node once all nodes it depends on have finished, so that independent branches run concurrently
+        in_processes = isinstance(executor, ProcessPoolExecutor)
+        results = [None] * len(self.nodes)
+        waiting = [len(dependencies) for dependencies in self.dependencies]
+        ready = [node for node, count in enumerate(waiting) if count == 0]
+        running = dict()
+
+        def finish(node, result):
+            results[node] = result
+            for consumer in self.consumers[node]:
+                waiting[consumer] -= 1
+                if waiting[consumer] == 0:
+                    ready.append(consumer)
+
+        try:
+            while ready or running:
+                while ready:
+                    node = ready.pop()
+                    method = self.nodes[node][0]
+                    args, kwargs = self._arguments(node, results, values)
+                    key = None
+                    portable = _portable(method) if in_processes else None
+                    if isinstance(method, MethodHasher):  # caches are only accessed from the scheduling thread
+                        key, found, value = method._lookup(args, kwargs)
+                        if found:
+                            finish(node, value)
+                            continue
+                        method = method._method
+                    split = getattr(self.nodes[node][0], "split", None)
+                    chunks, sizes = [(args, kwargs)], None
+                    if split is not None and isinstance(kwargs.get(split[0], None), int):
+                        seed = kwargs["seed"] if "seed" in kwargs else values.get("seed", None) \
+                            if "seed" in self.aspect_dependencies[node] else None
+                        sizes, seeds = _chunks(split, kwargs, getattr(executor, "_max_workers", None) or os.cpu_count() or 1, seed)
+                        chunks = [self._chunk(node, results, values, args, kwargs, split[0], size,
+                                              None if seeds is None else seeds[chunk]) for chunk, size in enumerate(sizes)]
+                    if in_processes and (portable is None or not all(_picklable(chunk) for chunk in chunks)):
+                        # e.g. methods built for arguments, or instances of lazy classes, run in this process
+                        parts = [method(*chunk_args, **chunk_kwargs) for chunk_args, chunk_kwargs in chunks]
+                        result = parts[0] if sizes is None else _combine(split[1], parts, sizes)
+                        if key is not None:
+                            self.nodes[node][0]._remember(key, result, args, kwargs)
+                        finish(node, result)
+                        continue
+                    method = portable if in_processes else method
+                    group = [node, key, args, kwargs, [None] * len(chunks), len(chunks), sizes]  # remaining chunks of a node
+                    for chunk, (chunk_args, chunk_kwargs) in enumerate(chunks):
+                        running[executor.submit(method, *chunk_args, **chunk_kwargs)] = (group, chunk)
+                if running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        group, chunk = running.pop(future)
+                        group[4][chunk] = future.result()
+                        group[5] -= 1
+                        if group[5] > 0:
+                            continue
+                        node, key, args, kwargs, parts, _, sizes = group
+                        result = parts[0] if sizes is None else _combine(self.nodes[node][0].split[1], parts, sizes)
+                        if key is not None:
+                            self.nodes[node][0]._remember(key, result, args, kwargs)
+                        finish(node, result)
+        finally:
+            for future in running:
+                future.cancel()
+        return results[-1]
+
+    def _chunk(self, node, results, values, args, kwargs, name, size, seed):
+        # arguments of one chunk of a split node, where dependencies reading the seed aspect rerun with the chunk's seed
+        if seed is not None:
+            rerun = set()
+            stack = [dependency for dependency in self.dependencies[node] if "seed" in self.aspect_dependencies[dependency]]
+            while stack:
+                dependency = stack.pop()
+                if dependency not in rerun:
+                    rerun.add(dependency)
+                    stack.extend(ancestor for ancestor in self.dependencies[dependency]
+                                 if "seed" in self.aspect_dependencies[ancestor])
+            if rerun:  # e.g. random number generators, which chunks would otherwise share
+                values = dict(values)
+                values["seed"] = seed
+                results = list(results)
+                for dependency in sorted(rerun):
+                    dependency_args, dependency_kwargs = self._arguments(dependency, results, values)
+                    results[dependency] = self.nodes[dependency][0](*dependency_args, **dependency_kwargs)
+                args, kwargs = self._arguments(node, results, values)
+        kwargs = dict(kwargs)
+        kwargs[name] = size
+        if seed is not None and "seed" in kwargs:
+            kwargs["seed"] = seed
+        return args, kwargs
+
+    async def _arun(self, values):
+        # each node awaits the nodes it depends on, so independent coroutines are awaited concurrently
+        results = [None] * len(self.nodes)
+        tasks = list()
+
+        async def run(node):
+            for dependency in self.dependencies[node]:
+                await tasks[dependency]
+            method = self.nodes[node][0]
+            args, kwargs = self._arguments(node, results, values)
+            key = None
+            if isinstance(method, MethodHasher):  # caches store awaited results instead of coroutines
+                key, found, value = method._lookup(args, kwargs)
+                if found:
+                    results[node] = value
+                    return
+                method = method._method
+            result = method(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            if key is not None:
+                self.nodes[node][0]._remember(key, result, args, kwargs)
+            results[node] = result
+
+        for node in range(len(self.nodes)):
+            tasks.append(asyncio.ensure_future(run(node)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return results[-1]
+
+    async def acall(self, **kwargs):
+        return await self._arun(self.bind(**kwargs))
+
+    def _vectorized(self, node):
+        method = self.nodes[node][0]
+        return getattr(method._method if isinstance(method, MethodHasher) else method, "_pyfop_vectorized", False)
+
+    def _sweep(self, bindings):
+        if not bindings:
+            return list()
+        values = [self.bind(**binding) for binding in bindings]
+        swept = set(bindings[0])
+        swept |= {name for name in self.reads if isinstance(values[0].get(name, None), _Deferred)}  # may read any aspect
+        varying = [not swept.isdisjoint(dependencies) for dependencies in self.aspect_dependencies]
+        vectorized = [False] * len(self.nodes)
+        shared = [None] * len(self.nodes)
+        for node in range(len(self.nodes)):  # aspect-independent nodes run once for the whole batch
+            if not varying[node]:
+                args, kwargs = self._arguments(node, shared, values[0])
+                shared[node] = self.nodes[node][0](*args, **kwargs)
+            elif self._vectorized(node) and all(vectorized[dependency] or not varying[dependency]
+                                                for dependency in self.dependencies[node]):
+                import numpy as np
+                batch = dict(values[0])
+                for name in bindings[0]:
+                    batch[name] = np.asarray([value[name] for value in values])
+                args, kwargs = self._arguments(node, shared, batch)
+                shared[node] = self.nodes[node][0](*args, **kwargs)
+                vectorized[node] = True
+        if vectorized[-1]:
+            return shared[-1]
+        if not varying[-1]:
+            return [shared[-1]] * len(bindings)
+        ret = list()
+        for i, value in enumerate(values):
+            results = [shared[node][i] if vectorized[node] else shared[node] for node in range(len(self.nodes))]
+            for node in range(len(self.nodes)):
+                if varying[node] and not vectorized[node]:
+                    args, kwargs = self._arguments(node, results, value)
+                    results[node] = self.nodes[node][0](*args, **kwargs)
+            ret.append(results[-1])
+        return ret
+
+    def specialize(self, **fixed):
+        # runs the nodes that only depend on fixed aspects and rebuilds the rest of the graph around their results
+        if self.calls is None:
+            raise Exception("Fused plans cannot be specialized")
+        from pyfop.utils import builder
+        values = self._bind(fixed, _empty)  # conflicts of free aspects are left for calls of the residual graph
+        bound = {name for name in fixed if not isinstance(values.get(name, None), _Deferred)}
+        constant = [bound.issuperset(dependencies) for dependencies in self.aspect_dependencies]
+        results = [None] * len(self.nodes)
+        for node in range(len(self.nodes)):
+            if constant[node]:
+                args, kwargs = self._arguments(node, results, values)
+                results[node] = self.nodes[node][0](*args, **kwargs)
+        index = {id(call): node for node, call in enumerate(self.calls)}
+        residual = [None] * len(self.nodes)
+
+        def replace(val, inherits):
+            if isinstance(val, Metamethod) and _isfop(val, inherits):
+                val = builder(val.method)
+            if not isinstance(val, PendingCall):
+                return val
+            node = index[id(val)]
+            return results[node] if constant[node] else residual[node]
+
+        dropped = dict()  # context additions of the calls that ran now, which still apply to the rest of the graph
+        recorder = _Recorder(dropped)
+        for node, call in enumerate(self.calls):
+            if constant[node]:
+                call._add_aspects(recorder)
+                continue
+            args = [replace(val, call.inherits) for val in call.args]
+            kwargs = {arg: replace(val, call.inherits) for arg, val in call.kwargs.items()}
+            descriptor = argparser.describe(call.method)
+            positional = descriptor.names[:len(args) if descriptor.varargs is None else min(len(args), descriptor.varargs)]
+            for arg, kind, payload in self.nodes[node][2]:
+                if kind == _ASPECT and payload in bound:  # fixed aspects become arguments of the calls reading them
+                    if arg in positional:
+                        args[positional.index(arg)] = values[payload]
+                    else:
+                        kwargs[arg] = values[payload]
+                elif kind == _RESULT and arg not in positional and arg not in call.kwargs:
+                    # lazy defaults are replaced by their specialized nodes instead of being built again without fixed aspects
+                    kwargs[arg] = results[payload] if constant[payload] else residual[payload]
+            residual[node] = PendingCall(call.method, *args, supercontext=call.supercontext, inherits=call.inherits, **kwargs)
+            residual[node].inject_aspects_to_context = call.inject_aspects_to_context
+        carried = list()  # layers of carrier calls, so that values of equal priority still conflict in the residual graph
+        for name in dropped.keys() - bound:  # also unread names, which calls may still set or which conflict
+            if "@" not in name:  # the strongest addition decides the aspect, as when gathering the whole graph
+                strongest = max(priority.value for _, priority, _ in dropped[name])
+                if strongest == Priority.IGNORE.value:
+                    continue
+                layer = 0
+                for value, priority, _ in dropped[name]:
+                    if priority.value == strongest and all(value is not other.default for other in
+                                                           (carried[previous][name] for previous in range(layer))):
+                        if layer == len(carried):
+                            carried.append(dict())
+                        carried[layer][name] = Aspect(value, priority)
+                        layer += 1
+        ret = residual[-1]
+        if constant[-1]:
+            ret = PendingCall(_constant, results[-1], supercontext=self.calls[-1].supercontext)
+            ret.inject_aspects_to_context = self.calls[-1].inject_aspects_to_context
+        for aspects in carried:
+            ret = PendingCall(_constant, ret, supercontext=self.calls[-1].supercontext, **aspects)
+        return ret
+
+    def sweep(self, **batches):
+        if len({len(batch) for batch in batches.values()}) > 1:
+            raise Exception("All swept aspects should have the same number of values")
+        return self._sweep([dict(zip(batches, values)) for values in zip(*batches.values())])
+
+    def grid(self, **batches):
+        return self._sweep([dict(zip(batches, values)) for values in itertools.product(*batches.values())])
+
+    def __call__(self, executor=None, **kwargs):
+        profile = profiling._active
+        if profile is not None:
+            return profile.plan(self, executor, kwargs)
+        values = self.bind(**kwargs)
+        return self._run(values) if executor is None else self._schedule(values, executor)
@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+import time
+from pyfop.cache import MethodHasher, _sizeof
+
+_active = None  # profile recording evaluations, checked once per call so that disabled profiling costs nothing per node
+_activation = threading.Lock()
+
+
+def _label(method):
+    if isinstance(method, MethodHasher):
+        method = method._method
+    return getattr(method, "__qualname__", None) or type(method).__name__
+
+
+class Profile(object):
+    def __init__(self):
+        self.events = list()  # (name, category, start, duration, thread, details) with times in seconds
+        self.previous = None
+        self.origin = time.perf_counter()
+
+    def __enter__(self):
+        global _active
+        with _activation:
+            self.previous = _active
+            _active = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global _active
+        with _activation:
+            _active = self.previous
+
+    def record(self, name, category, start, **details):
+        self.events.append((name, category, start, time.perf_counter()-start, threading.get_ident(), details))
+
+    def run(self, method, args, kwargs, resolving=0.):
+        # runs one node, attributing cache hits, result sizes and the time spent resolving its aspects
+        start = time.perf_counter()
+        hit = None
+        if isinstance(method, MethodHasher):
+            key, hit, result = method._lookup(args, kwargs)
+            if not hit:
+                result = method._method(*args, **kwargs)
+                method._remember(key, result, args, kwargs)
+        else:
+            result = method(*args, **kwargs)
+        self.record(_label(method), "node", start, hit=hit, nbytes=_sizeof(result), aspects=resolving)
+        return result
+
+    def plan(self, plan, executor, kwargs):
+        start = time.perf_counter()
+        values = plan.bind(**kwargs)
+        self.record("bind", "aspects", start, aspects=len(values))
+        if executor is not None or plan.incremental or plan.release:  # these modes are only timed as a whole
+            start = time.perf_counter()
+            ret = plan._run(values) if executor is None else plan._schedule(values, executor)
+            self.record("run", "plan", start, nodes=len(plan.nodes))
+            return ret
+        results = list()
+        for node in range(len(plan.nodes)):
+            start = time.perf_counter()
+            args, kwargs = plan._arguments(node, results, values)
+            results.append(self.run(plan.nodes[node][0], args, kwargs, time.perf_counter()-start))
+        return results[-1]
+
+    def statistics(self):
+        ret = dict()
+        for name, category, _, duration, _, details in list(self.events):
+            entry = ret.setdefault(name, {"category": category, "calls": 0, "time": 0., "hits": 0, "misses": 0,
+                                          "nbytes": 0, "aspects": 0.})
+            entry["calls"] += 1
+            entry["time"] += duration
+            if category == "node":
+                if details["hit"] is not None:
+                    entry["hits" if details["hit"] else "misses"] += 1
+                entry["nbytes"] += details["nbytes"]
+                entry["aspects"] += details["aspects"]
+        return ret
+
+    def report(self, top=10):
+        rows = sorted(self.statistics().items(), key=lambda item: -item[1]["time"])[:top]
+        width = max([len(name) for name, _ in rows] + [4])
+        ret = f"{'name':<{width}} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'hits':>6} {'misses':>6} {'MB':>9} {'aspects ms':>10}"
+        for name, entry in rows:
+            ret += f"\n{name:<{width}} {entry['calls']:>7} {entry['time']*1000:>10.3f} {entry['time']*1000/entry['calls']:>9.3f}" \
+                   f" {entry['hits']:>6} {entry['misses']:>6} {entry['nbytes']/2**20:>9.2f} {entry['aspects']*1000:>10.3f}"
+        return ret
+
+    def chrome_trace(self, path=None):
+        # trace event format, viewable in chrome://tracing or https://ui.perfetto.dev
+        ret = {"traceEvents": [{"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": thread,
+                                "ts": (start-self.origin)*1.E6, "dur": duration*1.E6, "args": details}
+                               for name, category, start, duration, thread, details in list(self.events)],
+               "displayTimeUnit": "ms"}
+        if path is not None:
+            with open(path, "w") as file:
+                json.dump(ret, file)
+        return ret
+
+
+def profile():
+    return Profile()
@@ -0,0 +1,255 @@
+from pyfop.aspect import Aspect
+from pyfop.execution import PendingCall, Metamethod, _attributes, _attribute, _empty
+from pyfop.cache import MethodHasher
+from weakref import WeakKeyDictionary
+import importlib
+import itertools
+import pickle
+
+_VERSION = 1  # increased whenever the layout of serialized graphs changes
+
+
+class _Ref:  # method imported by module and qualified name when graphs are loaded
+    __slots__ = ("kind", "module", "qualname", "resolved")
+
+    def __init__(self, kind, module, qualname):
+        self.kind = kind  # "metamethod" for lazy methods, "method" for plain ones or "attribute" for attribute access
+        self.module = module
+        self.qualname = qualname
+        self.resolved = None  # pickles share references that several calls use, so each is imported once
+
+    def __reduce__(self):
+        return _Ref, (self.kind, self.module, self.qualname)
+
+    def resolve(self):
+        if self.resolved is None:
+            self.resolved = self._import()
+        return self.resolved
+
+    def _import(self):
+        if self.kind == "attribute":
+            return _attribute(self.qualname)
+        ret = importlib.import_module(self.module)
+        for name in self.qualname.split("."):
+            ret = getattr(ret, name)
+        if self.kind == "metamethod" and not isinstance(ret, Metamethod):
+            raise Exception(f"{self.module}.{self.qualname} is not a lazy method")
+        return ret
+
+    def __call__(self, *args, **kwargs):
+        # worker processes run the method itself, since caches stay with the process that schedules calls
+        method = self.resolve()
+        if isinstance(method, Metamethod):
+            method = method.method
+        if isinstance(method, MethodHasher):
+            method = method._method
+        return method(*args, **kwargs)
+
+
+class _Call:  # position of an earlier call in the serialized node list
+    __slots__ = ("index",)
+
+    def __init__(self, index):
+        self.index = index
+
+    def __reduce__(self):
+        return _Call, (self.index,)
+
+
+class _Meta:  # lazy method that is not importable by name, such as attributes of calls
+    __slots__ = ("method", "args", "kwargs", "inherits")
+
+    def __init__(self, method, args, kwargs, inherits):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.inherits = inherits
+
+    def __reduce__(self):
+        return _Meta, (self.method, self.args, self.kwargs, self.inherits)
+
+
+def _importable(method):
+    # module and qualified name under which a method or the lazy method wrapping it can be imported
+    inner = method._method if isinstance(method, MethodHasher) else method
+    module = getattr(inner, "__module__", None)
+    qualname = getattr(inner, "__qualname__", None)
+    if module is None or qualname is None or "<" in qualname:
+        return None
+    try:
+        return _Ref("method", module, qualname).resolve()
+    except Exception:
+        return None
+
+
+def _method(method):
+    for name, attribute in _attributes.items():
+        if attribute is method:
+            return _Ref("attribute", None, name)
+    found = _importable(method)
+    inner = method._method if isinstance(method, MethodHasher) else method
+    if found is method:
+        return _Ref("method", inner.__module__, inner.__qualname__)
+    if isinstance(found, Metamethod) and found.method is method:  # loaded calls share the cache of the lazy method
+        return _Ref("metamethod", inner.__module__, inner.__qualname__)
+    if not isinstance(method, MethodHasher):
+        try:
+            pickle.dumps(method)
+            return method
+        except Exception:
+            pass
+    raise Exception(f"Cannot serialize {getattr(inner, '__qualname__', inner)}: methods of serialized graphs "
+                    f"should be importable by module and qualified name")
+
+
+_portables = WeakKeyDictionary()
+
+
+def _portable(method):
+    # picklable equivalent of a method that executors can run in other processes, or None if there is none
+    try:
+        return _portables[method]
+    except (KeyError, TypeError):
+        pass
+    try:
+        ret = _method(method)
+    except Exception:
+        ret = None
+    inner = method._method if isinstance(method, MethodHasher) else method
+    if ret is None and inner is not method:  # e.g. caches of lazy methods assigned to other names
+        try:
+            ret = _method(inner)
+        except Exception:
+            pass
+    if ret is not None and isinstance(inner, type) and not _picklable(inner):  # e.g. classes decorated with @lazy
+        ret = None  # whose instances could not be sent back
+    try:
+        _portables[method] = ret
+    except TypeError:
+        pass
+    return ret
+
+
+def _picklable(value):
+    # whether a value can be sent to other processes, found without copying the buffers of arrays
+    try:
+        pickle.dumps(value, protocol=5, buffer_callback=lambda buffer: None)
+        return True
+    except Exception:
+        return False
+
+
+def _metamethod(method, encode):
+    found = _importable(method.method)
+    if found is method:
+        inner = method.method._method if isinstance(method.method, MethodHasher) else method.method
+        return _Ref("metamethod", inner.__module__, inner.__qualname__)
+    return _Meta(_method(method.method), tuple(encode(val) for val in method.supplementary_args),
+                 {arg: encode(val) for arg, val in method.supplementary_kwargs.items()},
+                 [_metamethod(inherit, encode) for inherit in method.inherits])
+
+
+def _dependencies(val, ret):
+    # appends the calls that a value of arguments or injected aspects holds
+    if isinstance(val, PendingCall):
+        ret.append(val)
+    elif isinstance(val, Aspect):
+        _dependencies(val.default, ret)
+    elif isinstance(val, Metamethod):
+        for arg in itertools.chain(val.supplementary_args, val.supplementary_kwargs.values()):
+            _dependencies(arg, ret)
+
+
+def _table(call):
+    # lists calls after their dependencies with an explicit stack, so that deep graphs fit
+    refs = dict()  # id of listed call -> its shared position marker
+    methods = dict()  # id of method -> its reference, since graphs reuse few methods across many calls
+    nodes = list()
+    calls = list()  # keeps listed calls alive so that their ids are not reused
+
+    def encode(val):
+        cls = val.__class__
+        if cls is PendingCall:
+            return refs[id(val)]
+        if cls is Metamethod:
+            return _metamethod(val, encode)
+        if cls is Aspect and isinstance(val.default, (PendingCall, Metamethod)):
+            ret = Aspect.__new__(Aspect)
+            ret.__dict__.update(val.__dict__)
+            ret.default = encode(val.default)
+            return ret
+        return val
+
+    stack = [(call, False)]
+    while stack:
+        call, expanded = stack.pop()
+        if id(call) in refs:
+            continue
+        if not expanded:
+            stack.append((call, True))
+            deps = list()
+            for val in itertools.chain(call.args, call.kwargs.values(), call.inject_aspects_to_context.values()):
+                _dependencies(val, deps)
+            stack.extend((dep, False) for dep in reversed(deps))
+            continue
+        method = methods.get(id(call.method))
+        if method is None:
+            method = methods[id(call.method)] = _method(call.method)
+        nodes.append((method,
+                      tuple([encode(val) for val in call.args]),
+                      {arg: encode(val) for arg, val in call.kwargs.items()},
+                      {arg: encode(val) for arg, val in call.inject_aspects_to_context.items()} or None,
+                      [_metamethod(inherit, encode) for inherit in call.inherits] or None,
+                      call.supercontext))
+        refs[id(call)] = _Call(len(calls))
+        calls.append(call)
+    return _VERSION, nodes
+
+
+def _decode(val, calls):
+    cls = val.__class__
+    if cls is _Call:
+        return calls[val.index]
+    if cls is _Ref:
+        return val.resolve()
+    if cls is _Meta:
+        ret = Metamethod(_decode(val.method, calls), *[_decode(arg, calls) for arg in val.args],
+                         **{arg: _decode(kwarg, calls) for arg, kwarg in val.kwargs.items()})
+        ret.inherits = set(_decode(inherit, calls) for inherit in val.inherits)
+        return ret
+    if cls is Aspect and val.default.__class__ in (_Call, _Ref, _Meta):
+        ret = Aspect.__new__(Aspect)
+        ret.__dict__.update(val.__dict__)
+        ret.default = _decode(val.default, calls)
+        return ret
+    return val
+
+
+def _graph(version, nodes):
+    if version != _VERSION:
+        raise Exception(f"Cannot load graphs serialized with format version {version} (supported: {_VERSION})")
+    calls = list()
+    for method, args, kwargs, injected, inherits, supercontext in nodes:
+        call = PendingCall.__new__(PendingCall)
+        method = _decode(method, calls)
+        call.method = method.method if isinstance(method, Metamethod) else method
+        call.args = tuple(_decode(val, calls) for val in args)
+        call.kwargs = {arg: _decode(val, calls) for arg, val in kwargs.items()}
+        call.inject_aspects_to_context = _empty if injected is None else {arg: _decode(val, calls) for arg, val in injected.items()}
+        call.inherits = () if inherits is None else set(_decode(inherit, calls) for inherit in inherits)
+        call.supercontext = supercontext
+        calls.append(call)
+    return calls[-1]
+
+
+def _lazy(encoded):
+    return _decode(encoded, None)
+
+
+def dumps(call, buffers=None):
+    # large constants such as arrays are appended to the buffers list instead of being copied, if one is given
+    return pickle.dumps(call, protocol=5, buffer_callback=None if buffers is None else buffers.append)
+
+
+def loads(data, buffers=None):
+    return pickle.loads(data, buffers=buffers)
@@ -3,6 +3,11 @@ from pyfop.aspect import Aspect, Priority
 import inspect# import signature, Parameter
 from inspect import Parameter
 from makefun import wraps, add_signature_parameters, remove_signature_parameters
+from weakref import WeakKeyDictionary
+import threading
+
+_built = WeakKeyDictionary()  # method -> its builder, since generating wrappers compiles source code
+_building = threading.RLock()  # so that concurrent graphs share one builder per method
 
 
 def signature(obj):
@@ -12,6 +17,18 @@ def signature(obj):
 
 
 def builder(method):
+    try:
+        return _built[method]
+    except KeyError:
+        with _building:
+            if method not in _built:
+                _built[method] = _builder(method)
+            return _built[method]
+    except TypeError:  # methods that cannot be weakly referenced
+        return _builder(method)
+
+
+def _builder(method):
     if isinstance(method, type):
         return type(method.__name__, (method,), {"__init__": builder(method.__init__)})
 
@@ -55,3 +72,8 @@ def autoaspects(method):
     def wrapper(*args, **kwargs):
         return method(*args, **kwargs)
     return wrapper
+
+
+def vectorized(method):
+    method._pyfop_vectorized = True  # sweeps pass arrays of all swept aspect values in one call
+    return method
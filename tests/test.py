@@ -1,4 +1,5 @@
 import pyfop as pfp
+import os
 import pytest
 
 
@@ -545,3 +546,812 @@ def test_meta():
 
     with pytest.raises(Exception):  # assert that it can only be applied on lazy execution
         pfp.meta()(lambda x: x)
+
+
+def test_compiled_plan():
+    @pfp.lazy
+    @pfp.autoaspects
+    def affine(x, scale=1, offset=0):
+        return x*scale + offset
+
+    @pfp.lazy
+    @pfp.autoaspects
+    def gm(x, y, affine=affine):
+        return (affine(x)*affine(y))**0.5
+
+    plan = ((affine(2)*affine(8))**0.5).compile()
+    assert plan(scale=3) == 12
+    assert plan(scale=2) == 8
+    assert plan() == 4
+    assert gm(2, 8).compile()(scale=3) == 12
+    with pytest.raises(Exception):
+        plan(unknown=1)
+
+
+def test_compiled_plan_conflicts():
+    @pfp.lazy
+    def add(x, permutation=pfp.Aspect(1)):
+        return x + permutation
+
+    @pfp.lazy
+    def mult(x, permutation=pfp.Aspect(2)):
+        return x * permutation
+
+    plan = mult(add(1)).compile()
+    with pytest.raises(Exception):
+        plan()  # different defaults
+    assert plan(permutation=3) == 12
+    with pytest.raises(Exception):
+        mult(add(1, 3), 2).compile()()
+
+
+def test_shared_calls_run_once():
+    runs = list()
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def step(x, inc=1):
+        runs.append(x)
+        return x + inc
+
+    x = step(0)
+    for _ in range(29):
+        y = step(x)
+        x = y*y - y*y + y
+    assert x.call(inc=2) == 60
+    assert len(runs) == 30
+    assert x.compile()(inc=1) == 30
+    assert len(runs) == 60
+
+    @pfp.lazy_no_cache
+    def source(x):
+        runs.append(x)
+        return x
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def use(x, inner=0):
+        return x + inner
+
+    graph = use(1) + use(2) + use(3)
+    assert graph.compile()(inner=source(10)) == 36  # lazy aspect values run once, however many calls read them
+    assert len(runs) == 61
+
+
+def test_bounded_cache():
+    @pfp.lazy(maxsize=2)
+    def square(x):
+        return [x*x]
+
+    results = [square(x).call() for x in range(4)]
+    assert square(3).call() is results[3]
+    assert square(0).call() is not results[0]  # evicted as least recently used
+    assert square(0).call() is square(0).call()
+    hasher = square.method
+    assert len(hasher._stored) == 2
+    assert hasher.evictions >= 3
+    assert hasher.hits >= 2
+
+
+def test_cache_forgets_collected_arguments():
+    import gc
+
+    class Value:
+        def __init__(self, x):
+            self.x = x
+
+    @pfp.eager
+    def get(value):
+        return value.x
+
+    value = Value(3)
+    assert get(value) == 3
+    hasher_entries = pfp.cache.statistics()["entries"]
+    del value
+    gc.collect()
+    assert pfp.cache.statistics()["entries"] == hasher_entries - 1
+
+
+def test_cache_budget():
+    import numpy as np
+
+    @pfp.lazy
+    def zeros(length):
+        return [0] * length
+
+    @pfp.lazy
+    def arrays(length):
+        return [np.zeros(length), {"weights": np.zeros(length)}]
+
+    try:
+        pfp.cache.budget(0)
+        first = zeros(100).call()
+        assert zeros(100).call() is not first
+        assert pfp.cache.statistics()["usage"] == 0
+        pfp.cache.budget(2**20)
+        length = 2**16
+        first = arrays(length).call()
+        assert arrays(length).call() is not first  # containers count the arrays they hold
+        assert pfp.cache.statistics()["usage"] <= 2**20
+    finally:
+        pfp.cache.budget(None)
+
+
+def test_cache_locks():
+    import threading
+    first = pfp.cache.MethodHasher(lambda x: x)
+    second = pfp.cache.MethodHasher(lambda x: x + 1)
+    held = threading.Event()
+    release = threading.Event()
+    results = list()
+
+    def hold():
+        with first._lock:
+            held.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait(5)
+    caller = threading.Thread(target=lambda: results.append(second(1)))
+    caller.start()
+    caller.join(1)
+    finished = list(results)
+    release.set()
+    holder.join()
+    assert finished == [2]  # caches of other methods are not blocked
+
+    def hold_global():
+        with pfp.cache._lock:
+            held.set()
+            release.wait(5)
+
+    held.clear()
+    release.clear()
+    holder = threading.Thread(target=hold_global)
+    holder.start()
+    held.wait(5)
+    caller = threading.Thread(target=lambda: results.append(second(2)))
+    caller.start()
+    caller.join(1)
+    finished = list(results)
+    release.set()
+    holder.join()
+    assert finished == [2, 3]  # stores without a budget do not take the global lock
+
+
+def test_content_cache_keys():
+    import numpy as np
+
+    @pfp.lazy(cache_key="content")
+    def total(x, weights):
+        return [np.sum(x * weights["scale"])]
+
+    first = total(np.array([1., 2.]), {"scale": (1, 2.)}).call()
+    assert total(np.array([1., 2.]), {"scale": (1, 2.)}).call() is first
+    assert total(np.array([1., 2.])[::1], {"scale": (1, 2)}).call() is not first  # 2 and 2. differ in type
+    assert total(np.array([[1., 0.], [2., 0.]])[:, 0], {"scale": (1, 2.)}).call() is first  # strided views hash their contents
+    assert total(np.array([1, 2]), {"scale": (1, 2.)}).call() is not first  # different dtype
+
+    @pfp.eager(cache_key="content")
+    def first_item(x):
+        return [x[0]]
+
+    assert first_item([object()]) is not first_item([object()])  # falls back to ids
+
+    class Point:
+        def __init__(self, x):
+            self.x = x
+
+    pfp.cache.register_hash(Point, lambda point: point.x)
+    assert first_item([Point(1)]) is first_item([Point(1)])
+    with pytest.raises(Exception):
+        pfp.lazy(cache_key="unknown")(lambda x: x)
+
+
+runs = list()  # not captured by persisted methods, since closure contents are part of their fingerprints
+
+
+def test_persistent_cache(tmp_path):
+    import numpy as np
+    runs.clear()
+
+    def scaled(x, scale=pfp.Aspect(2)):
+        runs.append(scale)
+        return x * scale
+
+    def other(x, scale=pfp.Aspect(2)):
+        return x * scale + 1
+
+    cache = pfp.cache.DiskCache(str(tmp_path), maxbytes=10**6)
+    first = pfp.lazy(scaled, persist=cache)(np.arange(3.)).call(scale=3.)
+    restarted = pfp.lazy(scaled, persist=cache)  # a new in-memory cache, as after a restart
+    second = restarted(np.arange(3.)).call(scale=3.)
+    assert len(runs) == 1
+    assert isinstance(second, np.memmap)
+    assert np.array_equal(first, second)
+    assert restarted(np.arange(3.)).call(scale=4.)[1] == 4
+    assert len(runs) == 2
+    assert pfp.lazy(other, persist=cache)(np.arange(3.)).call(scale=3.)[0] == 1  # other methods use other entries
+    assert pfp.lazy(scaled, persist=str(tmp_path))([1], scale=2).call() == [1, 1]  # pickled results
+    assert pfp.lazy(scaled, persist=str(tmp_path))([1], scale=2).call() == [1, 1]
+    assert len(runs) == 3
+    for y in [1, 2]:
+        @pfp.eager(persist=cache)
+        def shifted(x, y=y):  # edited defaults are not served from stale entries
+            return x + y
+
+        assert shifted(1) == 1 + y
+    for y in [1, 2]:
+        def closure(x):
+            return x + y
+
+        assert pfp.eager(closure, persist=cache)(1) == 1 + y
+    pfp.cache.DiskCache(str(tmp_path), maxbytes=0).evict()
+    assert not [name for name in os.listdir(str(tmp_path)) if not name.startswith(".")]
+
+
+def test_parallel_branches():
+    import threading
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+    barrier = threading.Barrier(2, timeout=5)
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def branch(x, scale=1):
+        barrier.wait()  # only passes if both branches run at the same time
+        return x * scale
+
+    with ThreadPoolExecutor(2) as executor:
+        assert (branch(1) + branch(2)).call(executor=executor, scale=2) == 6
+    with ProcessPoolExecutor(1) as executor:
+        assert (pfp.execution.add(1, 2) * 3).call(executor) == 9
+
+
+def test_async_calls():
+    import asyncio
+    started = list()
+
+    @pfp.lazy
+    @pfp.autoaspects
+    async def load(x, scale=1):
+        started.append(x)
+        while len(started) < 2:  # only finishes if both loads are awaited concurrently
+            await asyncio.sleep(0)
+        return x * scale
+
+    @pfp.lazy
+    def combine(x, y):
+        return x + y
+
+    graph = combine(load(1), load(2)) * 2
+    assert asyncio.run(asyncio.wait_for(graph.acall(scale=2), 5)) == 12
+    assert asyncio.run(graph.compile().acall(scale=2)) == 12  # cached results instead of awaited coroutines
+    assert len(started) == 2
+    for x in [5, 6]:
+        load(x).call(scale=3).close()  # coroutines returned by synchronous calls are not cached
+    assert asyncio.run(load(5).acall(scale=3)) == 15
+    assert asyncio.run(combine(load(5), load(6)).acall(scale=3)) == 33
+
+
+def test_aspect_sweeps():
+    import numpy as np
+    runs = list()
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def base(x, offset=0):
+        runs.append(x)
+        return x + offset
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def affine(x, scale=1):
+        return x * scale
+
+    graph = affine(base(2)) + base(3)
+    assert graph.sweep(scale=[1, 2, 3]) == [5, 7, 9]
+    assert len(runs) == 2  # base does not read scale, so it runs once for the whole sweep
+    assert graph.grid(scale=[1, 2], offset=[0, 1]) == [5, 7, 7, 10]
+    with pytest.raises(Exception):
+        graph.sweep(scale=[1, 2], offset=[0])
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    @pfp.vectorized
+    def vectorized_affine(x, scale=1):
+        runs.append(scale)
+        return x * scale
+
+    runs.clear()
+    result = vectorized_affine(base(2)).sweep(scale=[1, 2, 3])
+    assert isinstance(result, np.ndarray)
+    assert result.tolist() == [2, 4, 6]
+    assert len(runs) == 2  # one run of base and one vectorized run
+    assert (vectorized_affine(base(2)) + 1).sweep(scale=[1, 2, 3]) == [3, 5, 7]
+
+
+def test_incremental_plan():
+    runs = list()
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def sample(x, samples=10):
+        runs.append("sample")
+        return x * samples
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def shift(x, offset=0):
+        runs.append("shift")
+        return x + offset
+
+    plan = (sample(1) + shift(2)).compile(incremental=True)
+    assert plan(samples=100, offset=1) == 103
+    assert plan(samples=100, offset=2) == 104
+    assert runs.count("sample") == 1
+    assert runs.count("shift") == 2
+    assert plan(samples=1000, offset=2) == 1004
+    assert runs.count("sample") == 2
+    assert runs.count("shift") == 2
+    assert plan(samples=int("1000"), offset=2) == 1004  # equal but separately created values
+    assert len(runs) == 4
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def total(x, data=None):
+        return x + sum(data)
+
+    plan = total(0).compile(incremental=True)
+    data = [1, 2]
+    assert plan(data=data) == 3
+    data.append(3)
+    assert plan(data=data) == 6  # values changed in place are compared by contents
+
+
+def test_builder_memoization():
+    @pfp.lazy
+    @pfp.autoaspects
+    def method(x, offset=1):
+        return x + offset
+
+    @pfp.lazy
+    @pfp.autoaspects
+    def usage(x, method=method):
+        return method(x) + 1.5
+
+    assert pfp.builder(method.method) is pfp.builder(method.method)
+    assert usage(2)(offset=2) == 5.5
+    hashers = len(pfp.cache._hashers)
+    assert usage(2)(offset=3) == 6.5
+    assert len(pfp.cache._hashers) == hashers
+
+
+def test_attribute_calls():
+    @pfp.lazy
+    def values(n):
+        return list(range(n))
+
+    hashers = len(pfp.cache._hashers)
+    first = values(3).copy()
+    second = values(4).copy()
+    assert first.method is second.method
+    assert first() == [0, 1, 2]
+    assert second() == [0, 1, 2, 3]
+    assert len(pfp.cache._hashers) == hashers
+    assert not hasattr(values(3), "__array__")
+
+
+def test_deep_chains():
+    @pfp.lazy_no_cache
+    def step(i, scale=pfp.Aspect(1)):
+        return i * scale
+
+    total = step(0)
+    for i in range(1, 5000):
+        total = total + step(i)
+    assert total(scale=2) == 5000 * 4999
+    assert total.compile()(scale=1) == 5000 * 4999 // 2
+
+
+def test_interned_calls():
+    runs = list()
+
+    @pfp.lazy(intern=True)
+    @pfp.autoaspects
+    def affine(x, scale=1):
+        runs.append(x)
+        return x * scale
+
+    @pfp.lazy(cache_key="content", intern=True)
+    def total(values):
+        return sum(values)
+
+    assert affine(2) is affine(2)
+    assert affine(2) is not affine(3)
+    assert (affine(2) + affine(2))(scale=3) == 12
+    assert runs == [2]
+    assert total([1, 2]) is total([1, 2])
+    graph = affine(4)
+    assert len(affine.interned) == 1
+    del graph
+    assert len(affine.interned) == 0
+
+
+def test_operator_fusion():
+    import numpy as np
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def data(x, scale=1):
+        return x * scale
+
+    for x in [3, 2.5, np.arange(5.), np.arange(5), np.ones(3, dtype=np.float32)]:
+        graph = -abs((data(x)*2 + 1)/3 - 6)**2 + data(x)*data(x)
+        plan = graph.compile(fuse=True)
+        assert len(plan.nodes) == 4
+        expected = graph(scale=2)
+        result = plan(scale=2)
+        assert type(result) == type(expected)
+        assert np.array_equal(result, expected)
+        assert getattr(result, "dtype", None) == getattr(expected, "dtype", None)
+    for graph in [data(np.ones(3)) * (data(10) ** data(30)),  # scalar subexpressions do not overflow int64
+                  -data(np.ones(3, dtype=np.float32)) * (data(1.5) * data(1.5))]:  # nor promote float32 arrays
+        expected = graph()
+        result = graph.compile(fuse=True)()
+        assert np.array_equal(result, expected) and result.dtype == expected.dtype
+    shared = data(2) + 1
+    assert len((shared * shared).compile(fuse=True).nodes) == 3  # results used twice are not recomputed
+
+
+def test_released_intermediates():
+    import numpy as np
+    import weakref
+    alive = list()
+
+    @pfp.lazy
+    def ones(n):
+        ret = np.ones(n)
+        alive.append(weakref.ref(ret))
+        return ret
+
+    @pfp.lazy
+    def double(x):
+        ret = x * 2
+        alive.append(weakref.ref(ret))
+        return ret
+
+    @pfp.lazy
+    def total(x):
+        assert sum(ref() is not None for ref in alive) <= 2  # only the input of the previous step is still alive
+        return x.sum()
+
+    plan = total(double(double(double(ones(10**6))))).compile(release=True)
+    assert plan() == 8 * 10**6
+    assert all(ref() is None for ref in alive)
+    assert len(ones.method._stored) == 0
+    kept = pfp.lazy(ones.method._method, cache_large=True)
+    assert kept(10**6).compile(release=True)().sum() == 10**6
+    assert len(kept.method._stored) == 1
+    pfp.cache.large(None)
+    try:
+        assert ones(10**6).compile(release=True)().sum() == 10**6
+        assert len(ones.method._stored) == 1
+    finally:
+        pfp.cache.large()
+
+
+def test_concurrent_evaluation():
+    from concurrent.futures import ThreadPoolExecutor
+
+    @pfp.lazy
+    @pfp.autoaspects
+    def affine(x, scale=1, offset=0):
+        return x * scale + offset
+
+    graph = affine(2) + affine(3)
+    plan = graph.compile()
+
+    def evaluate(i):
+        return graph(scale=i, offset=1), plan(scale=i, offset=2)
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(evaluate, range(200)))
+    assert results == [(5*i + 2, 5*i + 4) for i in range(200)]
+    assert pfp.argparser.describe(affine.method._method).defaults["scale"].name is None
+
+
+def test_profile(tmp_path):
+    import json
+
+    @pfp.lazy
+    @pfp.autoaspects
+    def affine(x, scale=1):
+        return [x * scale] * 100
+
+    graph = pfp.execution.add(affine(2), affine(3))
+    plan = graph.compile()
+    with pfp.profile() as profile:
+        graph(scale=2)
+        graph(scale=2)
+        plan(scale=3)
+    graph(scale=4)  # not recorded
+    statistics = profile.statistics()
+    name = [name for name in statistics if name.endswith("affine")][0]
+    assert statistics[name]["calls"] == 6
+    assert statistics[name]["misses"] == 4
+    assert statistics[name]["hits"] == 2
+    assert statistics[name]["nbytes"] > 0
+    assert statistics["gather"]["calls"] == 2
+    assert statistics["bind"]["calls"] == 1
+    assert name in profile.report(top=3)
+    trace = profile.chrome_trace(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json") as file:
+        assert json.load(file) == trace
+    assert len(trace["traceEvents"]) == len(profile.events)
+
+
+def test_eager_fast_path(monkeypatch):
+    @pfp.eager_no_cache
+    def add(x, y=1):
+        return x + y
+
+    @pfp.eager
+    @pfp.autoaspects
+    def scaled(x, scale=1):
+        return x * scale
+
+    @pfp.lazy
+    def lazy_two():
+        return 2
+
+    calls = list()
+    call = pfp.execution.PendingCall.call
+    monkeypatch.setattr(pfp.execution.PendingCall, "call", lambda self, *args, **kwargs: calls.append(self) or call(self, *args, **kwargs))
+    assert add(1, y=2) == 3
+    assert len(calls) == 0
+    assert add(lazy_two(), 2) == 4
+    assert scaled(2, scale=3) == 6
+    assert len(calls) == 2
+
+    @pfp.eager_no_cache
+    def pending_default(x, y=lazy_two()):
+        return x + y
+
+    assert pending_default(1) == 3  # lazy defaults are evaluated on the full path
+
+
+def test_context_slots():
+    @pfp.lazy
+    @pfp.autoaspects
+    def affine(x, scale=1, offset=0):
+        return x * scale + offset
+
+    graph = affine(affine(2))
+    context = graph.get_input_context(scale=3)
+    assert context["scale"] == 3 and context["offset"] == 0
+    assert context.priorities["scale"] == pfp.Priority.HIGH
+    fork = context.fork()
+    fork.add("scale", 4, pfp.Priority.CRITICAL, is_default=True)
+    fork.add("extra", 1)
+    assert fork["scale"] == 4 and context["scale"] == 3
+    assert "extra" in fork and "extra" not in context and "extra" not in graph.get_input_context()
+    assert graph(offset=1) == 4
+    assert graph(scale=2) == 8
+    with pytest.raises(Exception, match="Unused argument: unknown"):
+        graph(unknown=1)
+    with pytest.raises(Exception, match="Conflicting values"):
+        fork.add("scale", 5, pfp.Priority.CRITICAL, is_default=True)
+
+
+def test_layered_aspects():
+    @pfp.lazy
+    @pfp.autoaspects
+    def affine(x, scale=1, offset=0):
+        return x * scale + offset
+
+    @pfp.lazy
+    @pfp.autoaspects
+    def shift(base=10):
+        return base
+
+    graph = affine(2)
+    specialized = graph.aspects(scale=3)
+    assert specialized.args is graph.args
+    assert specialized() == 6
+    assert specialized.aspects(offset=1)() == 7
+    assert specialized.aspects(scale=4)() == 8  # later layers override earlier ones
+    assert graph.aspects(offset=shift())(base=5) == 7  # aspects of injected calls are gathered when called
+    assert graph.aspects(offset=shift()).compile()(base=7) == 9
+    tenants = [graph.aspects(offset=i) for i in range(100)]
+    assert [tenant() for tenant in tenants] == [2 + i for i in range(100)]
+
+
+def test_specialize():
+    runs = list()
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def preprocess(x, tol=1.E-6):
+        runs.append("preprocess")
+        return [value * 2 for value in x]
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def model(data, rate=1):
+        runs.append("model")
+        return sum(data) * rate
+
+    @pfp.lazy_no_cache
+    def length(data):
+        runs.append("length")
+        return len(data)
+
+    data = preprocess([1, 2, 3])
+    graph = model(data) + length(data)
+    residual = graph.specialize(tol=1.E-3)
+    assert runs == ["preprocess", "length"]
+    assert residual(rate=2) == 27
+    assert residual(rate=3) == 39
+    assert residual() == 15
+    assert runs.count("preprocess") == 1 and runs.count("length") == 1
+    assert residual.compile()(rate=2) == 27
+    with pytest.raises(Exception):
+        residual(tol=1.)
+    assert graph.specialize(tol=1.E-3, rate=2)() == 27
+    with pytest.raises(Exception):
+        graph.specialize(unknown=1)
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def affine(x, scale=1, offset=0):
+        return x * scale + offset
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def gm(x, y, affine=affine):
+        return (affine(x) * affine(y)) ** 0.5
+
+    assert gm(2, 8).specialize(scale=3)(offset=1) == gm(2, 8)(scale=3, offset=1)  # lazy defaults keep fixed aspects
+    with pytest.raises(Exception):
+        gm(2, 8).specialize(scale=3)(scale=5, offset=0)
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def tagged(x, offset=0):
+        return x
+
+    @pfp.lazy_no_cache
+    def first(x):
+        return x
+
+    graph = affine(first(tagged(1, offset=5))) + affine(2)  # ran ahead of time, but sets offset with high priority
+    assert graph.specialize()() == graph() == 13
+    assert graph.specialize(scale=2)() == graph(scale=2) == 16
+    with pytest.raises(Exception):
+        graph.specialize()(offset=6)
+
+    @pfp.lazy_no_cache
+    def shifted(x, permutation=pfp.Aspect(1), tol=pfp.Aspect(0)):
+        return x + permutation + tol
+
+    @pfp.lazy_no_cache
+    def permuted(x, permutation=pfp.Aspect(2)):
+        return x * permutation
+
+    graph = permuted(shifted(1))  # permutation conflicts until calls set it
+    assert graph.specialize(tol=1)(permutation=3) == graph(permutation=3, tol=1) == 15
+    with pytest.raises(Exception):
+        graph.specialize(tol=1)()
+    graph = shifted(shifted(1, permutation=2), permutation=3)  # ran ahead of time, but still conflicts
+    with pytest.raises(Exception):
+        graph(tol=0)
+    with pytest.raises(Exception):
+        graph.specialize(tol=0)()
+
+
+@pfp.lazy(split="samples", reduce="concat", chunks=2)
+@pfp.autoaspects
+def split_uniform(rng, samples=4):  # process pools import split methods by module and qualified name
+    return list(rng.random(samples))
+
+
+def test_split_aspects():
+    import numpy as np
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+    runs = list()
+
+    @pfp.lazy(split="samples", reduce="mean", chunks=4)
+    @pfp.autoaspects
+    def integrate(samples=1000, seed=0):
+        runs.append(samples)
+        x = np.random.default_rng(seed).random(samples)
+        return np.mean(np.sqrt(1 - x**2))
+
+    @pfp.lazy(split="samples", reduce="concat", chunks=3)
+    @pfp.autoaspects
+    def draws(samples=10, seed=None):
+        return list(range(samples))
+
+    pi = 4 * integrate()
+    with ThreadPoolExecutor(2) as executor:
+        first = pi.call(executor, samples=100001, seed=1)
+        assert sorted(runs) == [25000, 25000, 25000, 25001]
+        pfp.cache.cleanup()
+        assert pi.call(executor, samples=100001, seed=1) == first  # reproducible
+        assert pi.call(executor, samples=100001, seed=2) != first
+        assert len(draws().call(executor)) == 10
+    assert abs(first - np.pi) < 0.05
+
+    @pfp.lazy_no_cache
+    @pfp.autoaspects
+    def generator(seed=None):
+        return np.random.default_rng(seed)
+
+    @pfp.lazy(split="samples", reduce="concat", chunks=2)
+    @pfp.autoaspects
+    def sample(rng, samples=4):
+        return [rng] * samples
+
+    @pfp.lazy(split="samples", reduce="concat", chunks=2)
+    @pfp.autoaspects
+    def uniform(rng, samples=4):
+        return list(rng.random(samples))
+
+    with ThreadPoolExecutor(2) as executor:  # chunks rerun dependencies reading the seed aspect
+        rngs = sample(generator()).call(executor, samples=4, seed=1)
+        assert rngs[0] is rngs[1] and rngs[0] is not rngs[2]
+        assert uniform(generator()).call(executor, seed=1) == uniform(generator()).call(executor, seed=1)
+        expected = split_uniform(generator()).call(executor, seed=1)
+
+    @pfp.lazy_no_cache
+    class Generator:  # instances cannot be pickled, since the class's name refers to the lazy method
+        @pfp.autoaspects
+        def __init__(self, seed=None):
+            self.rng = np.random.default_rng(seed)
+
+        def random(self, samples):
+            return self.rng.random(samples)
+
+    with ProcessPoolExecutor(2) as executor:
+        assert split_uniform(generator()).call(executor, seed=1) == expected
+        assert split_uniform(Generator()).call(executor, seed=1) == expected  # runs in this process instead
+
+    def aggregate(x, reduce="sum"):
+        return x, reduce
+
+    assert pfp.lazy(aggregate, reduce="max")(1).call() == (1, "max")  # supplementary arguments named like options
+    with pytest.raises(TypeError):
+        pfp.lazy(reduction="max")
+
+
+@pfp.lazy
+@pfp.autoaspects
+def serialized_scale(x, scale=1):  # serialized graphs import methods by module and qualified name
+    return x * scale
+
+
+def test_serialization():
+    import pickle
+    import numpy as np
+    x = np.arange(10.)
+    graph = serialized_scale(x).sum() * 2
+    buffers = list()
+    data = pfp.dumps(graph, buffers)
+    loaded = pfp.loads(data, buffers)
+    assert len(buffers) == 1 and np.shares_memory(np.asarray(buffers[0]), x)  # arrays are not copied
+    assert loaded.call(scale=2) == graph.call(scale=2) == 180
+    assert loaded.method is graph.method  # lazy methods are imported by name
+    assert pickle.loads(pickle.dumps(graph.aspects(scale=4))).call() == 360
+    assert pickle.loads(pickle.dumps(serialized_scale)) is serialized_scale
+    deep = serialized_scale(0)
+    for i in range(5000):
+        deep = deep + i
+    assert pfp.loads(pfp.dumps(deep)).call(scale=2) == deep.call(scale=2)
+
+    @pfp.lazy
+    def local(x):
+        return x
+
+    with pytest.raises(Exception):
+        pfp.dumps(local(1))